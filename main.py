@@ -1,12 +1,12 @@
-import os
+import argparse
+import contextlib
 import time
 
 import pygame
 
-from simulation import Color, Simulator, UIElement, Text, Button, State
-
-RANDOMLY_ADD_CARS = pygame.USEREVENT + 1
-REFRESH = pygame.USEREVENT + 2
+from simulation import Color, Fonts, Simulator, UIElement, Text, Button, State
+from simulation.trace import TraceRecorder, Trajectory, TrajectoryRecorder
+from simulation.worker import SimulationThread
 
 HD = 1280, 720
 FHD = 1920, 1080
@@ -23,10 +23,7 @@ pygame.display.set_caption("Traffic Simulator")
 clock = pygame.time.Clock()
 
 
-def main(sim: Simulator):
-
-    # pygame.time.set_timer(RANDOMLY_ADD_CARS, 200)
-    pygame.time.set_timer(REFRESH, 1000)
+def main(sim: Simulator, threaded: bool = False):
     sim.pause()
     draw_fps(sim)
     sim.needs_refresh = True
@@ -36,31 +33,109 @@ def main(sim: Simulator):
     sim.load_basic_light(value=50)
 
     load_components(sim)
-    while sim.running:
-        dt = clock.tick(FPS) / 1000
-        sim.dt = dt
-        check_events(sim)
 
-        # if time.time() - time_updated >= 0.5:
-        window.fill((49, 92, 46))
+    # Threaded, the simulation steps on its own and frames draw snapshots
+    worker = SimulationThread(sim) if threaded else None
+    lock = worker.lock if worker else contextlib.nullcontext()
+    if worker:
+        worker.start()
+
+    try:
+        while sim.running:
+            dt = clock.tick(FPS) / 1000
+            with lock:
+                check_events(sim)
+
+                # Views cover the window with their pre-rendered backgrounds
+                if sim.needs_refresh:
+                    window.fill((49, 92, 46))
+
+                if worker is None:
+                    # Any number of fixed physics steps, then one render of the result
+                    sim.advance(dt)
+                elif sim.needs_refresh or sim.paused:
+                    sim.update_layout()
+                    worker.refresh()
+            dirty = sim.draw(worker.interpolated() if worker else None)
+            # sim.draw_debug()
+
+            fps_rect = draw_fps(sim)
+
+            sim.needs_refresh = False
+            if dirty is None:
+                pygame.display.update()
+            else:
+                dirty.append(fps_rect)
+                pygame.display.update(dirty)
+    finally:
+        # Before the recorders close, so no step records into a closed file
+        if worker:
+            worker.stop()
+
+
+def replay(sim: Simulator, path: str):
+    """
+    Play back a recorded trajectory without simulating it.
+
+    Space pauses, up and down change the speed, left and right seek 10
+    seconds (60 with shift) and clicking or dragging along the window seeks
+    to that fraction of the run. sim.now is the playback clock.
+    """
+    trajectory = Trajectory(path)
+    sim.now = trajectory.start
+    sim.needs_refresh = True
 
-        sim.update()
-        sim.move()
-        sim.draw()
-        # sim.draw_debug()
+    base_font = Fonts.get("Roboto-Light.ttf", 24)
+    Text(sim,
+         anchor=UIElement.TOP_L,
+         source=UIElement.TOP_L,
+         font=base_font,
+         text=lambda sim: f"Replay: {sim.now:.1f} / {trajectory.end:.0f}s ({sim.speed_str})",
+         layer=UIElement.FOREGROUND,
+         background_color=(49, 92, 46),
+         dynamic=True
+         )
 
-        draw_fps(sim)
+    def scrub(x: int):
+        fraction = min(max(x / sim.width, 0.0), 1.0)
+        sim.now = trajectory.start + fraction * (trajectory.end - trajectory.start)
+
+    while sim.running:
+        dt = clock.tick(FPS) / 1000
+        for event in pygame.event.get():
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                sim.pause()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_UP:
+                sim.increase_speed()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_DOWN:
+                sim.decrease_speed()
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                step = 60 if event.mod & pygame.KMOD_SHIFT else 10
+                sim.now += step if event.key == pygame.K_RIGHT else -step
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                scrub(event.pos[0])
+            elif event.type == pygame.MOUSEMOTION and event.buttons[0]:
+                scrub(event.pos[0])
+            else:
+                check_event(sim, event)
 
         if sim.needs_refresh:
-            window.fill(Color.WHITE)
-        sim.needs_refresh = False
-        pygame.display.update()
+            window.fill((49, 92, 46))
+            sim.update_layout()
+        sim.now = min(max(sim.now + dt * sim.speed, trajectory.start), trajectory.end)
+        dirty = sim.draw(trajectory.at(sim.now))
+
+        fps_rect = draw_fps(sim)
+        if dirty is None:
+            pygame.display.update()
+        else:
+            dirty.append(fps_rect)
+            pygame.display.update(dirty)
 
 
 def load_components(sim: Simulator):
     # custom speed broke
-    base_font = pygame.font.Font(
-        os.path.join("Assets", "Roboto-Light.ttf"), 24)
+    base_font = Fonts.get("Roboto-Light.ttf", 24)
     speed_text = Text(sim,
                       anchor=UIElement.TOP_L,
                       source=UIElement.TOP_L,
@@ -89,8 +164,7 @@ def load_components(sim: Simulator):
                      offset=(0, 60),
                      background_color=(49, 92, 46),
                      )
-    base_font = pygame.font.Font(
-        os.path.join("Assets", "Roboto-Light.ttf"), 20)
+    base_font = Fonts.get("Roboto-Light.ttf", 20)
     lane_1_multi = Text(sim,
                         anchor=UIElement.TOP_L,
                         source=UIElement.TOP_L,
@@ -326,9 +400,7 @@ def load_components(sim: Simulator):
                           border_radius=5,
                           action=lambda sim: sim.toggle_light(2),
                           )
-    big_font = pygame.font.Font(
-        os.path.join("Assets", "DSEG7.ttf"), 40
-    )
+    big_font = Fonts.get("DSEG7.ttf", 40)
     view_1_countdown = Text(sim,
                             view=sim.view_1,
                             anchor=UIElement.CENTER,
@@ -399,50 +471,72 @@ def load_components(sim: Simulator):
 
 def check_events(sim: Simulator):
     for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            exit()
-        elif event.type == pygame.VIDEORESIZE:
-            # Check if the new size is below the minimum size
+        check_event(sim, event)
+
+
+def check_event(sim: Simulator, event: pygame.event.Event):
+    if event.type == pygame.QUIT:
+        pygame.quit()
+        exit()
+    elif event.type == pygame.VIDEORESIZE:
+        # Check if the new size is below the minimum size
+        sim.needs_refresh = True
+        new_width = max(event.w, HD[0])
+        new_height = max(event.h, HD[1])
+
+        # Only resize if necessary
+        if new_width != event.w or new_height != event.h:
+            pygame.display.set_mode(
+                (new_width, new_height), pygame.RESIZABLE)
+        else:
+            pygame.display.set_mode(
+                (event.w, event.h), pygame.RESIZABLE)
+    elif event.type == pygame.KEYDOWN:
+        if event.key == pygame.K_h:
+            sim.hide_hud = not sim.hide_hud
             sim.needs_refresh = True
-            new_width = max(event.w, HD[0])
-            new_height = max(event.h, HD[1])
+        elif event.key == pygame.K_F11:
+            sim.toggle_fullscreen()
+    elif event.type == pygame.MOUSEBUTTONDOWN:
+        if event.button == 1:
+            sim.handle_button_press(event)
 
-            # Only resize if necessary
-            if new_width != event.w or new_height != event.h:
-                pygame.display.set_mode(
-                    (new_width, new_height), pygame.RESIZABLE)
-            else:
-                pygame.display.set_mode(
-                    (event.w, event.h), pygame.RESIZABLE)
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_h:
-                sim.hide_hud = not sim.hide_hud
-            elif event.key == pygame.K_F11:
-                sim.toggle_fullscreen()
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:
-                sim.handle_button_press(event)
-        elif event.type == RANDOMLY_ADD_CARS:
-            if not sim.paused:
-                sim.randomly_add_cars()
-        elif event.type == REFRESH:
-            sim.view_1.update_cars()
-            sim.view_2.update_cars()
-
-
-def draw_fps(sim: Simulator):
+
+def draw_fps(sim: Simulator) -> pygame.Rect:
     fps_counter = str(int(clock.get_fps()))
-    font = pygame.font.Font(os.path.join("Assets", "Mada-Medium.ttf"), 24)
-    fps_text = font.render(fps_counter, True, Color.BLACK)
+    font = Fonts.get("Mada-Medium.ttf", 24)
+    fps_text = Fonts.render(font, fps_counter, Color.BLACK)
     fps_rect = fps_text.get_rect()
     fps_rect.bottomleft = (9, HEIGHT - 30)
     fps_rect.y += 30
     window.fill((49, 92, 46), fps_rect)
-    window.blit(fps_text, (9, sim.height - 30))
+    return fps_rect.union(window.blit(fps_text, (9, sim.height - 30)))
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Traffic Simulator")
+    parser.add_argument("--threaded", action="store_true",
+                        help="step the simulation on its own thread")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="record car and light events to a columnar trace directory")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record car positions and lights for --replay")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="play back a run recorded with --record or run_scenario")
+    args = parser.parse_args()
+
     is_fullscreen = False
-    sim = Simulator(window, device_info, is_fullscreen, RANDOMLY_ADD_CARS)
-    main(sim)
+    sim = Simulator(window, device_info, is_fullscreen)
+    if args.replay:
+        replay(sim, args.replay)
+        exit()
+    if args.trace:
+        sim.trace = TraceRecorder(args.trace)
+    if args.record:
+        sim.trajectory = TrajectoryRecorder(args.record)
+    try:
+        main(sim, threaded=args.threaded)
+    finally:
+        for recorder in (sim.trace, sim.trajectory):
+            if recorder is not None:
+                recorder.close()
@@ -6,3 +6,4 @@ from .classes import (
     Text,
     Button,
 )
+from .assets import Fonts
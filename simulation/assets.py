@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import functools
+import os
+
+import pygame
+
+
+class Images:
+    """
+    Process-wide cache of the static road images.
+
+    Each file is decoded once and every scaled (and rotated) variant is
+    derived from the original, so repeated resizes never rescale an
+    already scaled surface.
+    """
+
+    _originals: dict[str, pygame.Surface] = {}
+    _variants: dict[tuple[str, tuple[int, int], int], pygame.Surface] = {}
+
+    @classmethod
+    def load(cls, name: str) -> pygame.Surface:
+        image = cls._originals.get(name)
+        if image is None:
+            image = pygame.image.load(os.path.join("Assets", name)).convert_alpha()
+            cls._originals[name] = image
+        return image
+
+    @classmethod
+    def scaled(cls, name: str, size: tuple[int, int], angle: int = 0) -> pygame.Surface:
+        """Return name scaled to size, then rotated by a multiple of 90 degrees."""
+        key = (name, size, angle)
+        image = cls._variants.get(key)
+        if image is None:
+            image = pygame.transform.scale(cls.load(name), size)
+            if angle:
+                image = pygame.transform.rotate(image, angle)
+            cls._variants[key] = image
+        return image
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._originals.clear()
+        cls._variants.clear()
+
+
+class CarSprites:
+    """
+    Process-wide cache of the stacked car sprites.
+
+    Every colour sheet is decoded and scaled once, then each heading bucket
+    is pre-rotated and flattened into a single surface, so drawing a car
+    is one lookup and one blit.
+    """
+
+    SPRITE_SIZE = 16
+    LAYER_HEIGHT = 1
+    HEADING_STEP = 5  # Degrees per pre-rotated heading bucket
+
+    _layers: dict[tuple[int, tuple[int, int]], list[pygame.Surface]] = {}
+    _stacks: dict[tuple[int, tuple[int, int]], list[pygame.Surface]] = {}
+
+    @classmethod
+    def layers(cls, color: int, size: tuple[int, int]) -> list[pygame.Surface]:
+        key = (color, size)
+        layers = cls._layers.get(key)
+        if layers is None:
+            layers = cls._load(color, size)
+            cls._layers[key] = layers
+            cls._stacks[key] = [cls._stack(layers, angle)
+                                for angle in range(0, 360, cls.HEADING_STEP)]
+        return layers
+
+    @classmethod
+    def get(cls, color: int, size: tuple[int, int], angle: float) -> pygame.Surface:
+        """Return the flattened stack for the heading bucket nearest angle."""
+        if (color, size) not in cls._stacks:
+            cls.layers(color, size)
+        bucket = round(angle / cls.HEADING_STEP) % (360 // cls.HEADING_STEP)
+        return cls._stacks[(color, size)][bucket]
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._layers.clear()
+        cls._stacks.clear()
+
+    @classmethod
+    def _load(cls, color: int, size: tuple[int, int]) -> list[pygame.Surface]:
+        sprite_sheet = pygame.image.load(
+            os.path.join("Assets", "cars", f"{color}.png")
+        ).convert_alpha()
+        sprite_w = sprite_h = cls.SPRITE_SIZE
+        sprite_num = sprite_sheet.get_width() // sprite_w
+
+        layers = []
+        for i in range(sprite_num):
+            sprite = pygame.Surface((sprite_w, sprite_h), pygame.SRCALPHA)
+            sprite.blit(sprite_sheet, (0, 0),
+                        (i * sprite_w, 0, sprite_w, sprite_h))
+            layers.append(pygame.transform.scale(sprite, size))
+        return layers
+
+    @classmethod
+    def _stack(cls, layers: list[pygame.Surface], angle: float) -> pygame.Surface:
+        # Layer i sits i pixels above the base, so the flattened surface is
+        # drawn (len(layers) - 1) * LAYER_HEIGHT above the car's rect
+        rotated = [pygame.transform.rotate(layer, angle) for layer in layers]
+        rise = (len(rotated) - 1) * cls.LAYER_HEIGHT
+        width = max(img.get_width() for img in rotated)
+        height = max(img.get_height() for img in rotated) + rise
+        stack = pygame.Surface((width, height), pygame.SRCALPHA)
+        stack.blits([(img, (0, rise - i * cls.LAYER_HEIGHT))
+                     for i, img in enumerate(rotated)])
+        return stack.convert_alpha()
+
+    @classmethod
+    def rise(cls, color: int, size: tuple[int, int]) -> int:
+        return (len(cls.layers(color, size)) - 1) * cls.LAYER_HEIGHT
+
+
+class Fonts:
+    """One loaded font per face and size, plus a cache of rendered text."""
+
+    _fonts: dict[tuple[str, int], pygame.font.Font] = {}
+
+    @classmethod
+    def get(cls, name: str, size: int) -> pygame.font.Font:
+        font = cls._fonts.get((name, size))
+        if font is None:
+            font = pygame.font.Font(os.path.join("Assets", name), size)
+            cls._fonts[(name, size)] = font
+        return font
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def render(font: pygame.font.Font,
+               text: str,
+               color: tuple[int, int, int],
+               ) -> pygame.Surface:
+        return font.render(text, True, color)
@@ -1,40 +1,72 @@
 from __future__ import annotations
 
 import math
-import os
-import random
-import time
 from abc import abstractmethod
-from typing import Callable, Optional
+from collections import deque
+from typing import Callable, Iterable, Iterator, Optional
 
 import numpy as np
 import pygame
 
-from .utills import ease, lerp
+from .utills import cached_geometry, ease
 from . import trafficlight
-
-RANDOMLY_ADD_CARS = pygame.USEREVENT + 1
+from .arrivals import ArrivalStream
+from .assets import CarSprites, Fonts, Images
+from .events import Event, EventQueue
+from .metrics import VehicleMetrics
+from .rng import RandomStreams
+from .snapshot import Snapshot
+from .spatial import SpatialGrid
+from .trace import TraceRecorder, TrajectoryRecorder
+from .vehicles import VehicleStore
 
 
 class Simulator:
 
+    DEFAULT_SIZE = (1920, 1080)
+    WORLD_SIZE = (1920, 1080)  # Units the simulation runs in, whatever the window
+    SCHEDULE_HORIZON = 60.0  # Seconds of arrivals drawn at a time
+    FIXED_STEP = 1 / 60  # Simulated seconds per physics step
+    MAX_STEPS_PER_FRAME = 1000  # Beyond this a frame drops the rest of its time
+    WARP_WINDOW = 0.5  # Real seconds the achieved warp is measured over
+    MAX_SPEED = 1000.0
+
     def __init__(self,
-                 window: pygame.Surface,
-                 device_info,
-                 is_fullscreen,
-                 user_event_1: int,
+                 window: Optional[pygame.Surface] = None,
+                 device_info=None,
+                 is_fullscreen=False,
+                 *,
+                 size: Optional[tuple[int, int]] = None,
+                 seed: Optional[int] = None,
                  ) -> None:
+        """Passing no window runs headless, with size standing in for the window's."""
         self.window = window
-        self.resolution = (self.window.get_width(), self.window.get_height())
+        self.rng = RandomStreams(seed)
+        self.headless = window is None
+        if self.headless:
+            self.size = size or Simulator.DEFAULT_SIZE
+        else:
+            self.size = (self.window.get_width(), self.window.get_height())
+        self.resolution = self.size
         self.device_info = device_info
         self.is_fullscreen = is_fullscreen
         self.running = True
-        self.time_started = time.time()
+        self.now = 0.0  # Simulation clock in seconds, advanced by tick()
+        self.events = EventQueue()
+        self.time_step = 0.0
+        self.time_started = self.now
         self.time_speed: float = 1.0
-        self.randomly_add_cars_event = user_event_1
+        self.trace: Optional[TraceRecorder] = None  # Opt-in event recorder
+        self.trajectory: Optional[TrajectoryRecorder] = None  # Opt-in position recorder
 
+        self.vehicles = VehicleStore()
         self.view_1 = ViewLeft(self)
         self.view_2 = ViewRight(self)
+        self.views: list[View] = [self.view_1, self.view_2]
+        self.arrivals: Optional[ArrivalStream] = None
+        self.scheduled = True  # Whether arrivals are drawn from the spawn rates
+        self.demand: Optional[Iterator[ArrivalStream]] = None  # Streams still to come
+        self.arrival_event: Optional[Event] = self.events.schedule(self.now, self.spawn_arrivals)
 
         self.hide_hud = False
 
@@ -45,43 +77,101 @@ class Simulator:
             1.0,
             ]
 
-        self.light_1 = None
-        self.light_2 = None
-
         self.needs_refresh = True
         self.bg_elements: list[UIElement] = []
         self.mg_elements: list[UIElement] = []
         self.fg_elements: list[UIElement] = []
         self.buttons: list[Button] = []
+        self.car_rects: Optional[list[pygame.Rect]] = None  # Last frame's cars
+        self.stale_rects: list[pygame.Rect] = []  # Areas HUD elements moved off
         self.paused = False
         self.dt = 0.0
+        self.accumulator = 0.0  # Simulated time owed to the next physics steps
+        # Simulated seconds per real second while frames hit MAX_STEPS_PER_FRAME,
+        # None while the set speed is kept up with
+        self.warp: Optional[float] = None
+        self.warp_real = 0.0
+        self.warp_steps = 0
+        self.warp_capped = False
         self.base_spawn_rate = 1000
         self.multiplier = 1
 
-        pygame.time.set_timer(RANDOMLY_ADD_CARS, self.base_spawn_rate)
+        # Simulated ms since the per-view car lists were last refreshed
+        self.refresh_timer = 0.0
 
-        self.divider = pygame.image.load(os.path.join("Assets", "divider.png"))
-        self.divider = pygame.transform.scale(
-            self.divider, (self.divider.get_width(), self.window.get_height()))
+        if self.headless:
+            return
+
+        self.divider = Images.scaled(
+            "divider.png", (Images.load("divider.png").get_width(), self.window.get_height()))
         self.divider_rect = self.divider.get_rect()
         self.divider_rect.center = (
             self.window.get_width() / 2, self.window.get_height() / 2)
 
     def reset_all(self) -> None:
+        old_views = self.views
         del self.view_1
         del self.view_2
 
-        self.view_1 = ViewLeft(self)
-        self.view_2 = ViewRight(self)
+        self.vehicles.clear()
+        self.views = []
+        for old in old_views:
+            # Transitions of the old lights must not fire on the new ones
+            for road in old:
+                if road.light.event is not None:
+                    road.light.event.cancel()
+            view = type(old)(self)
+            view.index = old.index
+            view.light = old.light
+            if view.light is not None:
+                view.light.view = view
+            self.views.append(view)
+        self.view_1, self.view_2 = self.views[:2]
 
         self.needs_refresh = True
 
+    def add_view(self) -> View:
+        """Add an undrawn intersection fed with the same cars as the others."""
+        view = ViewLeft(self)
+        view.index = len(self.views)
+        self.views.append(view)
+        return view
+
+    @property
+    def light_1(self):
+        return self.view_1.light
+
+    @light_1.setter
+    def light_1(self, light) -> None:
+        self.view_1.light = light
+
+    @property
+    def light_2(self):
+        return self.view_2.light
+
+    @light_2.setter
+    def light_2(self, light) -> None:
+        self.view_2.light = light
+
     @property
     def time(self) -> int:
-        return int(time.time() - self.time_started)
+        return int(self.now - self.time_started)
 
     def reset_time(self) -> None:
-        self.time_started = time.time()
+        self.time_started = self.now
+
+    def tick(self, time_step: float) -> None:
+        """Advance the clock by time_step, firing the events due within it."""
+        self.time_step = time_step
+        self.events.run_until(self, self.now + time_step)
+
+    def next_event_time(self) -> float:
+        """Earliest time an event or light controller can change anything."""
+        return min([self.events.next_time()] +
+                   [view.light.next_change() for view in self.views if view.light is not None])
+
+    def is_idle(self) -> bool:
+        return len(self.vehicles) == 0
 
     def reset(self) -> None:
         self.reset_time()
@@ -94,7 +184,11 @@ class Simulator:
 
     @property
     def speed_str(self) -> str:
-        return "Paused" if self.paused else f"{self.speed:.2f}x"
+        if self.paused:
+            return "Paused"
+        if self.warp is not None:
+            return f"{self.speed:.2f}x (reaching {self.warp:.0f}x)"
+        return f"{self.speed:.2f}x"
 
     @speed.setter
     def speed(self, value: float) -> None:
@@ -108,25 +202,45 @@ class Simulator:
                          base_offset: int = 30,
                          increment_value: float = 1.0,
                          no_traffic_multiplier: float = 5.0,
-                         value_per_car: float = 1.0
+                         value_per_car: float = 1.0,
+                         view: Optional[View] = None,
                          ) -> None:
-        self.light_1 = trafficlight.Smart(
-            self, max_value, base_offset, increment_value, no_traffic_multiplier, value_per_car)
+        view = view or self.view_1
+        self.unload_light(view)
+        view.light = trafficlight.Smart(
+            self, max_value, base_offset, increment_value, no_traffic_multiplier, value_per_car,
+            view=view)
 
     def load_basic_light(self,
-                         value=120.0
+                         value=120.0,
+                         view: Optional[View] = None,
                          ) -> None:
-        self.light_2 = trafficlight.Basic(self, value)
+        view = view or self.view_2
+        light = trafficlight.Basic(self, value, view=view)
+        self.unload_light(view)
+        view.light = light
+
+    def unload_light(self, view: View) -> None:
+        """Remove the view's controller, cancelling any switch it scheduled."""
+        if isinstance(view.light, trafficlight.Basic):
+            view.light.event.cancel()
+        view.light = None
 
     def increase_speed(self) -> None:
         if self.paused:
             self.pause()
-        self.time_speed = min(5.0, self.time_speed + 0.1)
+        if self.time_speed >= 5.0:
+            self.time_speed = min(Simulator.MAX_SPEED, self.time_speed * 2)
+        else:
+            self.time_speed = min(5.0, self.time_speed + 0.1)
 
     def decrease_speed(self) -> None:
         if self.paused:
             self.pause()
-        self.time_speed = max(0.0, self.time_speed - 0.1)
+        if self.time_speed > 5.0:
+            self.time_speed = max(5.0, self.time_speed / 2)
+        else:
+            self.time_speed = max(0.0, self.time_speed - 0.1)
 
     def get_active_road_cars(self, view_index=1) -> int:
         if view_index == 1:
@@ -142,8 +256,15 @@ class Simulator:
 
     @property
     def rect(self) -> pygame.Rect:
+        if self.headless:
+            return pygame.Rect(0, 0, *self.size)
         return self.window.get_rect()
 
+    @property
+    def screen_rect(self) -> pygame.Rect:
+        # UI elements anchor on the screen area of a View or the Simulator
+        return self.rect
+
     @property
     def dt(self) -> float:
         return self._dt
@@ -154,10 +275,14 @@ class Simulator:
 
     @property
     def width(self) -> int:
+        if self.headless:
+            return self.size[0]
         return self.window.get_width()
 
     @property
     def height(self) -> int:
+        if self.headless:
+            return self.size[1]
         return self.window.get_height()
 
     def add_button(self, button: Button) -> None:
@@ -198,26 +323,80 @@ class Simulator:
             self.road_spawn_rate[index] = min(2.0, self.road_spawn_rate[index] + 0.1)
         else:
             self.multiplier = min(5.0, self.multiplier + 0.1)
-            pygame.time.set_timer(RANDOMLY_ADD_CARS, int(
-                self.base_spawn_rate / self.multiplier))
+        self.reschedule()
 
     def decrease_spawn_rate(self, index: Optional[int] = None) -> None:
         if index is not None:
             self.road_spawn_rate[index] = max(0.1, self.road_spawn_rate[index] - 0.1)
         else:
             self.multiplier = max(0.1, self.multiplier - 0.1)
-            pygame.time.set_timer(RANDOMLY_ADD_CARS, int(
-                self.base_spawn_rate / self.multiplier))
-
-    def randomly_add_cars(self, chance: Optional[int] = 50, road_index: Optional[int] = None) -> None:
-        color = random.randint(1, 9)
-        ran = random.randint(0, 120)
-        direction = random.randint(0, 2)
-        if road_index is None:
-            road_index = random.randint(0, 3)
-        if ran <= chance * self.road_spawn_rate[road_index]:
-            self.view_1[road_index].add_car(direction, color)
-            self.view_2[road_index].add_car(direction, color)
+        self.reschedule()
+
+    def spawn(self, road_index: int, direction: int, color: int, **attributes) -> None:
+        """Add the same car to road_index of every view."""
+        for view in self.views:
+            view[road_index].add_car(direction, color, **attributes)
+
+    def arrival_rates(self) -> list[float]:
+        """Mean cars per second on each road for the current spawn settings."""
+        attempts = self.multiplier * 1000 / self.base_spawn_rate / len(self.road_spawn_rate)
+        return [attempts * min(1.0, (50 * rate + 1) / 121) for rate in self.road_spawn_rate]
+
+    def schedule_arrivals(self, start: float) -> None:
+        """Draw the next SCHEDULE_HORIZON seconds of Poisson arrivals."""
+        self.arrivals = ArrivalStream.poisson(
+            self.arrival_rates(), Simulator.SCHEDULE_HORIZON, self.rng.arrivals, start)
+        self.scheduled = True
+
+    def reschedule(self) -> None:
+        """Redraw upcoming arrivals after the spawn rates changed."""
+        if self.scheduled:
+            self.arrivals = None
+            self.spawn_arrivals()
+
+    def replay(self, arrivals: Optional[ArrivalStream]) -> None:
+        """Spawn cars from a pre-drawn stream, or the spawn rates if None."""
+        self.arrivals = arrivals
+        self.demand = None
+        self.scheduled = arrivals is None
+        self.spawn_arrivals()
+
+    def stream(self, demand: Iterable[ArrivalStream]) -> None:
+        """Spawn cars from consecutive streams, e.g. DemandFile.arrivals."""
+        self.arrivals = None
+        self.demand = iter(demand)
+        self.scheduled = False
+        self.spawn_arrivals()
+
+    def next_arrivals(self) -> Optional[ArrivalStream]:
+        if self.scheduled:
+            start = self.now if self.arrivals is None else self.arrivals.end
+            self.schedule_arrivals(start)
+        elif self.demand is not None:
+            self.arrivals = next(self.demand, None)
+            if self.arrivals is None:
+                self.demand = None
+        else:
+            return None
+        return self.arrivals
+
+    def spawn_arrivals(self) -> None:
+        """Spawn the arrivals due now and schedule the call for the next one."""
+        if self.arrival_event is not None:
+            self.arrival_event.cancel()
+            self.arrival_event = None
+        arrivals = self.arrivals if self.arrivals is not None else self.next_arrivals()
+        while arrivals is not None:
+            arrivals.replay(self)
+            if arrivals.cursor < len(arrivals):
+                time = float(arrivals.time[arrivals.cursor])
+            elif self.now < arrivals.end:
+                time = arrivals.end
+            else:
+                arrivals = self.next_arrivals()
+                continue
+            self.arrival_event = self.events.schedule(time, self.spawn_arrivals)
+            return
 
     def set_preset(self,
                    r1: Optional[float] = None,
@@ -229,45 +408,148 @@ class Simulator:
         self.road_spawn_rate[1] = self.road_spawn_rate[1] if r2 is None else r2
         self.road_spawn_rate[2] = self.road_spawn_rate[2] if r3 is None else r3
         self.road_spawn_rate[3] = self.road_spawn_rate[3] if r4 is None else r4
+        self.reschedule()
 
     def draw_debug(self) -> None:
+        if self.headless:
+            return
         self.view_1.draw_debug()
         self.view_2.draw_debug()
 
-    def draw(self) -> None:
-        self.view_1.draw()
-        self.view_2.draw()
+    def draw(self, snapshot: Optional[Snapshot] = None) -> Optional[list[pygame.Rect]]:
+        """Draw the frame and return the changed regions, or None for all of it."""
+        if self.headless:
+            self.needs_refresh = False
+            return None
+
+        full = self.needs_refresh or self.car_rects is None
+        if full:
+            damaged = None
+        else:
+            # The divider is translucent, so restore what is under it too
+            damaged = self.car_rects + self.stale_rects + [self.divider_rect]
+        self.stale_rects = []
+        dirty = self.view_1.draw(damaged, snapshot) + self.view_2.draw(damaged, snapshot)
+
         if not self.hide_hud:
-            for element in self.bg_elements:
-                element.draw()
-        self.view_1.draw_cars()
-        self.view_2.draw_cars()
-        self.window.blit(self.divider, self.divider_rect)
+            self.draw_elements(self.bg_elements, dirty, full)
+        car_rects = self.view_1.draw_cars(snapshot) + self.view_2.draw_cars(snapshot)
+        dirty += car_rects
+        dirty.append(self.window.blit(self.divider, self.divider_rect))
         if not self.hide_hud:
-            for element in self.mg_elements:
-                element.draw()
-            for element in self.fg_elements:
-                element.draw()
-            for button in self.buttons:
-                button.draw()
+            self.draw_elements(self.mg_elements, dirty, full)
+            self.draw_elements(self.fg_elements, dirty, full)
+            self.draw_elements(self.buttons, dirty, full)
 
+        self.car_rects = car_rects
         self.needs_refresh = False
-
-    def update(self) -> None:
-        if self.needs_refresh:
-            self.divider = pygame.transform.scale(
-                self.divider, (self.divider.get_width(), self.view_1.road_top.road_width *3))
+        return None if full else dirty
+
+    def draw_elements(self,
+                      elements: list[UIElement],
+                      dirty: list[pygame.Rect],
+                      full: bool,
+                      ) -> None:
+        # Redraw elements whose content changed or that were painted over
+        batch = []
+        for element in elements:
+            if full or element.changed() or element.rect.collidelist(dirty) != -1:
+                old_rect = element.rect.copy()
+                element.draw(batch)
+                dirty.append(old_rect.union(element.rect))
+                if old_rect != element.rect:
+                    self.stale_rects.append(old_rect)
+        self.window.blits(batch, doreturn=False)
+
+    def update_layout(self) -> None:
+        """Fit the views, roads and divider to the current window size."""
+        for view in self.views:
+            view.layout()
+        if not self.headless:
+            self.divider = Images.scaled(
+                "divider.png", (self.divider.get_width(),
+                                round(self.view_1.road_top.road_width * 3 * self.view_1.scale)))
             self.divider_rect = self.divider.get_rect()
             self.divider_rect.center = (self.window.get_width() / 2,
                                         self.window.get_height() / 2)
-        self.view_1.update()
-        self.light_1.update()
-        self.view_2.update()
-        self.light_2.update()
+
+    def update(self) -> None:
+        for view in self.views:
+            view.update()
+            if view.light is not None:
+                view.light.update()
 
     def move(self) -> None:
-        self.view_1.move()
-        self.view_2.move()
+        if self.paused:
+            return
+        self.vehicles.move(self.time_step)
+
+    def substep(self, time_step: float) -> None:
+        """One physics step of time_step simulated seconds."""
+        self.tick(time_step)
+
+        self.refresh_timer += self.time_step * 1000
+        if self.refresh_timer >= 1000:
+            self.refresh_timer -= 1000
+            for view in self.views:
+                view.update_cars()
+
+        self.update()
+        self.move()
+        if self.trajectory is not None:
+            self.trajectory.capture(self)
+
+    def steps_due(self, dt: float) -> int:
+        """The FIXED_STEP steps owed for a frame of dt real seconds."""
+        self.dt = dt
+        self.accumulator += dt * self.speed
+        steps = int(self.accumulator / Simulator.FIXED_STEP + 1e-9)
+        if steps > Simulator.MAX_STEPS_PER_FRAME:
+            steps = Simulator.MAX_STEPS_PER_FRAME
+            self.accumulator = 0.0
+            self.warp_capped = True
+        else:
+            self.accumulator = max(0.0, self.accumulator - steps * Simulator.FIXED_STEP)
+
+        self.warp_real += dt
+        self.warp_steps += steps
+        if self.warp_real >= Simulator.WARP_WINDOW:
+            warp = self.warp_steps * Simulator.FIXED_STEP / self.warp_real
+            self.warp = warp if self.warp_capped else None
+            self.warp_real, self.warp_steps, self.warp_capped = 0.0, 0, False
+        return steps
+
+    def advance(self, dt: float) -> int:
+        """Take the FIXED_STEP steps owed for dt real seconds; returns how many."""
+        if self.needs_refresh:
+            self.update_layout()
+        steps = self.steps_due(dt)
+        for _ in range(steps):
+            self.substep(Simulator.FIXED_STEP)
+        return steps
+
+    def skip(self, time_step: float) -> None:
+        """Move the clock without firing events, to at most next_event_time()."""
+        self.time_step = time_step
+        self.now += time_step
+        self.update()
+
+    def run(self, duration: float, dt: float = FIXED_STEP) -> None:
+        """Step headless for duration simulated seconds, skipping idle stretches."""
+        if self.needs_refresh:
+            self.update_layout()
+        elapsed = 0.0
+        while self.running and elapsed < duration:
+            if self.is_idle():
+                gap = min(self.next_event_time() - self.now, duration - elapsed)
+                steps = math.ceil(gap / dt) - 1
+                if steps > 0:
+                    self.skip(steps * dt)
+                    elapsed += steps * dt
+                    continue
+            self.substep(dt)
+            self.needs_refresh = False
+            elapsed += dt
 
     def add_element(self, element: UIElement) -> None:
         if element.z == 0:
@@ -280,10 +562,15 @@ class Simulator:
 
 class View:
 
-    rect: pygame.Rect
+    rect: pygame.Rect  # Fixed area of the world the roads are laid out in
 
     def __init__(self, sim: Simulator) -> None:
         self.sim = sim
+        self.screen_rect = self.rect.copy()  # Where rect is drawn in the window
+        self.scale = 1.0
+        self.screen_version = 0
+        self.background: Optional[pygame.Surface] = None
+        self.background_version = -1
 
         self.road_top = RoadTop(self, 2)
         self.road_right = RoadRight(self, 0)
@@ -291,13 +578,17 @@ class View:
         self.road_left = RoadLeft(self, 0)
 
         self.cars = []
+        self.light = None  # Controller switching this view's lights
+        self.grid = SpatialGrid()
         self.car_leaves = 0
+        self.metrics = VehicleMetrics()
 
     def increment_car_leaves(self) -> None:
         self.car_leaves += 1
 
     def reset_car_leaves(self) -> None:
         self.car_leaves = 0
+        self.metrics = VehicleMetrics()
 
     def average_car_leaves(self) -> str:
         try:
@@ -309,11 +600,35 @@ class View:
 
     @property
     def width(self) -> int:
-        return self.rect.width
+        return self.screen_rect.width
 
     @property
     def height(self) -> int:
-        return self.rect.height
+        return self.screen_rect.height
+
+    def resize(self, screen_rect: pygame.Rect) -> None:
+        """Fit the world rect into screen_rect, keeping its aspect ratio."""
+        if screen_rect != self.screen_rect or self.sim.needs_refresh:
+            self.screen_rect = screen_rect
+            self.scale = min(screen_rect.width / self.rect.width,
+                             screen_rect.height / self.rect.height)
+            self.screen_version += 1
+
+    def to_screen(self, x: float, y: float) -> tuple[int, int]:
+        return (int(self.screen_rect.centerx + (x - self.rect.centerx) * self.scale),
+                int(self.screen_rect.centery + (y - self.rect.centery) * self.scale))
+
+    def rect_to_screen(self, rect: pygame.Rect) -> pygame.Rect:
+        x, y = self.to_screen(rect.x, rect.y)
+        return pygame.Rect(x, y, round(rect.width * self.scale), round(rect.height * self.scale))
+
+    @property
+    def sprite_size(self) -> tuple[int, int]:
+        return (round(Car.SPRITE_SIZE[0] * self.scale),
+                round(Car.SPRITE_SIZE[1] * self.scale))
+
+    def layout(self) -> None:
+        """Place the view in the window; subclasses call resize."""
 
     def update_cars(self) -> None:
         self.cars = self.road_top.cars + self.road_right.cars + \
@@ -341,40 +656,79 @@ class View:
         return self.cars
 
     def update(self) -> None:
+        self.grid.rebuild(self.road_top.cars + self.road_right.cars +
+                          self.road_bottom.cars + self.road_left.cars)
         self.road_top.update()
         self.road_right.update()
         self.road_bottom.update()
         self.road_left.update()
 
-    def move(self) -> None:
-        self.road_top.move()
-        self.road_right.move()
-        self.road_bottom.move()
-        self.road_left.move()
-
     def draw_debug(self) -> None:
-        self.sim.window.set_clip(self.rect)
+        self.sim.window.set_clip(self.screen_rect)
         self.road_top.draw_debug()
         self.road_right.draw_debug()
         self.road_bottom.draw_debug()
         self.road_left.draw_debug()
         self.sim.window.set_clip(None)
 
-    def draw_cars(self) -> None:
-        self.sim.window.set_clip(self.rect)
-        self.road_top.draw_cars()
-        self.road_right.draw_cars()
-        self.road_bottom.draw_cars()
-        self.road_left.draw_cars()
-        self.sim.window.set_clip(None)
-
-    def draw(self) -> None:
-        self.sim.window.set_clip(self.rect)
-        self.road_top.draw()
-        self.road_right.draw()
-        self.road_bottom.draw()
-        self.road_left.draw()
+    def draw_cars(self, snapshot: Optional[Snapshot] = None) -> list[pygame.Rect]:
+        self.sim.window.set_clip(self.screen_rect)
+        if snapshot is None:
+            rects = self.road_top.draw_cars() + self.road_right.draw_cars() + \
+                self.road_bottom.draw_cars() + self.road_left.draw_cars()
+        else:
+            rects = snapshot.draw_cars(self.sim.window, self)
         self.sim.window.set_clip(None)
+        return rects
+
+    def render_background(self) -> None:
+        """Pre-render the static roads at screen_rect's size."""
+        self.road_top.update_graphic()
+        world = pygame.Surface(self.rect.size).convert()
+        world.fill(Color.GRASS_DARK)
+        x, y = self.rect.topleft
+        world.blits(
+            [(image, (bx - x, by - y)) for image, (bx, by) in self.road_top.blit_list],
+            doreturn=False)
+
+        self.background = pygame.Surface(self.screen_rect.size).convert()
+        self.background.fill(Color.GRASS_DARK)
+        area = self.rect_to_screen(self.rect)
+        if area.size != world.get_size():
+            world = pygame.transform.smoothscale(world, area.size)
+        self.background.blit(world, area.move(-self.screen_rect.x, -self.screen_rect.y))
+        self.background_version = self.screen_version
+
+    def draw(self,
+             damaged: Optional[list[pygame.Rect]] = None,
+             snapshot: Optional[Snapshot] = None,
+             ) -> list[pygame.Rect]:
+        """Repaint the background under damaged (all if None) and stale lights."""
+        if self.background_version != self.screen_version:
+            self.render_background()
+            damaged = None
+        window = self.sim.window
+        screen_rect = self.screen_rect
+        window.set_clip(screen_rect)
+        if damaged is None:
+            window.blit(self.background, screen_rect)
+            dirty = [screen_rect.copy()]
+        else:
+            dirty = []
+            for rect in damaged:
+                area = rect.clip(screen_rect)
+                if area.width and area.height:
+                    window.blit(self.background, area,
+                                area.move(-screen_rect.x, -screen_rect.y))
+                    dirty.append(area)
+        for road in self:
+            light = road.light
+            state = None if snapshot is None else snapshot.lights[self.index][road.direction]
+            if damaged is None or light.changed(state) or light.rect.collidelist(dirty) != -1:
+                road.draw(state)
+                dirty.append(light.rect)
+        window.set_clip(None)
+        return dirty
 
     def toggle_lights(self) -> None:
         self.road_top.toggle_lights()
@@ -417,31 +771,36 @@ class View:
 
 class ViewLeft(View):
 
+    index = 0
+
     def __init__(self, sim: Simulator) -> None:
-        self.rect = pygame.Rect(0, 0, sim.width // 2, sim.height)
+        width, height = Simulator.WORLD_SIZE
+        self.rect = pygame.Rect(0, 0, width // 2, height)
         super().__init__(sim)
 
-    def update(self) -> None:
-        self.rect = pygame.Rect(0, 0, self.sim.width // 2, self.sim.height)
-        super().update()
+    def layout(self) -> None:
+        self.resize(pygame.Rect(0, 0, self.sim.width // 2, self.sim.height))
 
 
 class ViewRight(View):
 
+    index = 1
+
     def __init__(self, sim: Simulator) -> None:
-        self.rect = pygame.Rect(sim.width // 2, 0, sim.width // 2, sim.height)
+        width, height = Simulator.WORLD_SIZE
+        self.rect = pygame.Rect(width // 2, 0, width // 2, height)
         super().__init__(sim)
 
-    def update(self) -> None:
-        self.rect = pygame.Rect(self.sim.width // 2, 0,
-                                self.sim.width // 2, self.sim.height)
-        super().update()
+    def layout(self) -> None:
+        self.resize(pygame.Rect(self.sim.width // 2, 0,
+                                self.sim.width // 2, self.sim.height))
 
 
 class Road:
 
     def __init__(self, view: View, light_state: int = 0) -> None:
         self.view = view
+        self._geometry_cache: dict[str, object] = {}
         self.car_spawn_distance = 100
         self.lane_left = LaneLeft(self)
         self.lane_straight = LaneStraight(self)
@@ -449,20 +808,8 @@ class Road:
         self.lanes = [self.lane_left, self.lane_straight, self.lane_right]
         self.rect = self.get_bound()
         self.light_rect = self.get_light_bound()
-        self.cars: list[Car] = []
+        self.occupancy = 0  # Cars inside get_half_bound(), kept by Car.update
         self.light = TrafficLight(self, light_state)
-        self.load_sprite()
-        self.update_graphic()
-
-    def load_sprite(self) -> None:
-        self.center = pygame.image.load(
-            os.path.join("Assets", "intersect.png")
-        )
-        self.zebras = [pygame.transform.rotate(pygame.image.load(
-            os.path.join("Assets", "zebra.png")), 90 * i) for i in range(4)]
-        self.sprite = pygame.image.load(
-            os.path.join("Assets", "road.png")
-        )
 
     @property
     def is_active(self) -> bool:
@@ -473,18 +820,18 @@ class Road:
 
     def get_active_cars(self) -> int:
         if self.is_green():
-            cars = self.get_half_bound().collidelistall(
-                [car.rect for car in self.cars])
-            return len(cars)
+            return self.occupancy
         return 0
 
     def get_inactive_cars(self) -> int:
         if not self.is_green():
-            cars = self.get_half_bound().collidelistall(
-                [car.rect for car in self.cars])
-            return len(cars)
+            return self.occupancy
         return 0
 
+    @property
+    def cars(self) -> list[Car]:
+        return [*self.lane_left.cars, *self.lane_straight.cars, *self.lane_right.cars]
+
     @property
     def state(self) -> bool:
         return self.light.state
@@ -494,6 +841,7 @@ class Road:
         self.light.state = state
 
     @property
+    @cached_geometry
     def road_width(self) -> int:
         return int(self.view.rect.height * 0.1)
 
@@ -504,25 +852,18 @@ class Road:
     def toggle_lights(self) -> None:
         self.light.toggle()
 
-    def add_car(self, direction: int, color: int) -> None:
-        new_car = Car(self.lanes[direction], color=color)
-        self.cars.append(new_car)
+    def add_car(self, direction: int, color: int, **attributes) -> None:
+        lane = self.lanes[direction]
+        car = Car(lane, color=color, **attributes)
+        lane.add(car)
+        trace = self.view.sim.trace
+        if trace is not None:
+            trace.car(car, TraceRecorder.SPAWN)
 
     def update(self) -> None:
-        if self.view.sim.needs_refresh:
-            self.rect = self.get_bound()
-            self.light_rect = self.get_light_bound()
-            self.update_graphic()
-
-        self.light.update()
-
         for car in self.cars:
             car.update()
 
-    def move(self) -> None:
-        for car in self.cars:
-            car.move()
-
     def update_lane(self):
         for lane in self.lanes:
             lane.update()
@@ -547,28 +888,23 @@ class Road:
     def get_light_bound(self) -> pygame.Rect:
         ...
 
-    def draw_cars(self) -> None:
-        for car in self.cars:
-            car.draw()
+    def draw_cars(self) -> list[pygame.Rect]:
+        return [car.draw() for car in self.cars]
 
     def draw_debug(self) -> None:
-        pygame.draw.rect(self.window, self.color, self.get_half_bound(), 2)
-        pygame.draw.rect(self.window, self.color, self.light_rect, 5)
+        to_screen = self.view.rect_to_screen
+        pygame.draw.rect(self.window, self.color, to_screen(self.get_half_bound()), 2)
+        pygame.draw.rect(self.window, self.color, to_screen(self.light_rect), 5)
         for car in self.cars:
             car.draw()
 
     def update_graphic(self):
-        self.center = pygame.transform.scale(
-            self.center, (self.road_width * 2, self.road_width * 2)
-        )
-        new_zebra = [pygame.transform.scale(
-            zebra, (self.road_width * 2, self.road_width * 2)) for zebra in self.zebras]
-        self.zebras = new_zebra
-        self.sprite = pygame.transform.scale(
-            self.sprite, (self.road_width * 2, self.road_width * 2)
-        )
+        size = (self.road_width * 2, self.road_width * 2)
+        self.center = Images.scaled("intersect.png", size)
+        self.zebras = [Images.scaled("zebra.png", size, 90 * i) for i in range(4)]
+        self.sprite = Images.scaled("road.png", size)
         sprite_1 = self.sprite
-        sprite_2 = pygame.transform.rotate(self.sprite, 90)
+        sprite_2 = Images.scaled("road.png", size, 90)
         self.blit_list = []
 
         x = self.view.rect.width // 2 - self.road_width
@@ -620,8 +956,8 @@ class Road:
             to_blit = sprite_1, (x2 + i * length, y)
             self.blit_list.append(to_blit)
 
-    def draw(self) -> None:
-        self.light.draw()
+    def draw(self, light_state: Optional[int] = None) -> None:
+        self.light.draw(light_state)
 
 
 class RoadTop(Road):
@@ -634,6 +970,7 @@ class RoadTop(Road):
     def direction(self) -> int:
         return 0
 
+    @cached_geometry
     def get_half_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -645,6 +982,7 @@ class RoadTop(Road):
         h = view[3] - self.road_width
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -654,6 +992,7 @@ class RoadTop(Road):
         h = view[3]
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_light_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -663,6 +1002,7 @@ class RoadTop(Road):
         h = 5
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_light_coords(self) -> tuple[int, int]:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -671,13 +1011,6 @@ class RoadTop(Road):
         x += view[0]
         return x, y
 
-    def draw(self) -> None:
-        if self.view.sim.needs_refresh:
-            self.update_graphic()
-
-        self.window.blits(self.blit_list)
-        self.light.draw()
-
 
 class RoadRight(Road):
 
@@ -685,6 +1018,7 @@ class RoadRight(Road):
     def color(self) -> tuple[int, int, int]:
         return Color.RED
 
+    @cached_geometry
     def get_half_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -695,6 +1029,7 @@ class RoadRight(Road):
         h = self.road_width
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -704,6 +1039,7 @@ class RoadRight(Road):
         h = self.road_width
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_light_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -713,6 +1049,7 @@ class RoadRight(Road):
         h = self.road_width
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_light_coords(self) -> tuple[int, int]:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -731,6 +1068,7 @@ class RoadBottom(Road):
     def color(self) -> tuple[int, int, int]:
         return Color.BLUE
 
+    @cached_geometry
     def get_half_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -741,6 +1079,7 @@ class RoadBottom(Road):
         h = view[3] - self.road_width
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -750,6 +1089,7 @@ class RoadBottom(Road):
         h = view[3]
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_light_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -759,6 +1099,7 @@ class RoadBottom(Road):
         h = 5
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_light_coords(self) -> tuple[int, int]:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -778,6 +1119,7 @@ class RoadLeft(Road):
     def color(self) -> tuple[int, int, int]:
         return Color.BLACK
 
+    @cached_geometry
     def get_half_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -789,6 +1131,7 @@ class RoadLeft(Road):
         h = self.road_width
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -798,6 +1141,7 @@ class RoadLeft(Road):
         h = self.road_width
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_light_bound(self) -> pygame.Rect:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -807,6 +1151,7 @@ class RoadLeft(Road):
         h = self.road_width
         return pygame.Rect(x, y, w, h)
 
+    @cached_geometry
     def get_light_coords(self) -> tuple[int, int]:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -825,8 +1170,36 @@ class Lane:
     def __init__(self, road: Road) -> None:
         self.road = road
         self.view = road.view
-        self._car_spawn = self.get_car_spawn()
+        self._geometry_cache: dict[str, object] = {}
+        self.cars: deque[Car] = deque()  # Ordered front (leader) to back
+
+    def __len__(self) -> int:
+        return len(self.cars)
 
+    @property
+    def queue_length(self) -> int:
+        return len(self.cars)
+
+    def add(self, car: Car) -> None:
+        if self.cars:
+            leader = self.cars[-1]
+            leader.follower = car
+            car.leader = leader
+        self.cars.append(car)
+
+    def remove(self, car: Car) -> None:
+        if car.follower is not None:
+            car.follower.leader = car.leader
+        if car.leader is not None:
+            car.leader.follower = car.follower
+        car.leader = None
+        car.follower = None
+        if self.cars[0] is car:
+            self.cars.popleft()
+        else:
+            self.cars.remove(car)
+
+    @cached_geometry
     def get_car_spawn(self) -> tuple[int, int]:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -847,18 +1220,20 @@ class Lane:
 
     @property
     def car_spawn(self) -> tuple[int, int]:
-        return self._car_spawn
+        return self.get_car_spawn()
 
     @property
     def width(self) -> int:
         return self.road.road_width // 4
 
     def update(self) -> None:
-        self._car_spawn = self.get_car_spawn()
+        # The spawn point also depends on the road's car_spawn_distance
+        self._geometry_cache.clear()
 
 
 class LaneLeft(Lane):
 
+    @cached_geometry
     def get_car_spawn(self) -> tuple[int, int]:
         view = [self.view.rect.x, self.view.rect.y,
                 self.view.rect.width, self.view.rect.height]
@@ -899,6 +1274,8 @@ class Car:
 
     BASE_SPEED = 200.0
     BASE_ACCEL = 100.0
+    SIZE = (30, 30)
+    SPRITE_SIZE = (SIZE[0] + 10, SIZE[1] + 10)
 
     ACCELERATING = 1
     DECELERATING = 2
@@ -911,25 +1288,37 @@ class Car:
                  accel: Optional[float] = None,
                  color: Optional[int] = None,
                  speed: Optional[float] = None,
+                 jitter: Optional[tuple[float, float]] = None,
+                 gap: Optional[int] = None,
                  ) -> None:
         self.lane = lane
         self.road = lane.road
-        self.size = (30, 30)
+        self.size = Car.SIZE
+
+        self.leader: Optional[Car] = None
+        self.follower: Optional[Car] = None
+        self.in_zone = False
+
+        self.store = lane.view.sim.vehicles
+        self.index = self.store.add(self)
+        self.store.view[self.index] = lane.view.index
+        self.store.road[self.index] = lane.road.direction
+        self.store.lane[self.index] = lane.road.lanes.index(lane)
 
+        rng = lane.view.sim.rng.car
         if not color:
-            self.color = random.randint(1, 9)
+            self.color = rng.randint(1, 9)
         else:
             self.color = color
 
-        self.load_sprites()
-
-        self.old_view_rect = lane.view.rect.width, lane.view.rect.height
-        r_modifier = random.random()
-        self._speed = speed or Car.BASE_SPEED + r_modifier
-        r_modifier = random.random()
-        self.accel = accel or Car.BASE_ACCEL + r_modifier
+        if speed is None:
+            speed = Car.BASE_SPEED + rng.random()
+        self._speed = speed
+        if accel is None:
+            accel = Car.BASE_ACCEL + rng.random()
+        self.accel = accel
         x, y = lane.car_spawn
-        ran = [random.uniform(-2, 2), random.uniform(-2, 2)]
+        ran = jitter or (rng.uniform(-2, 2), rng.uniform(-2, 2))
         x = x + ran[0]
         y = y + ran[1]
         self.rect = pygame.Rect(x, y, self.size[0], self.size[1])
@@ -937,12 +1326,13 @@ class Car:
         self.y = y
 
         self.state = Car.ACCELERATING
-        self.time = time.time()
+        self.time = self.simulator.now  # When state last changed
+        self.spawn_time = self.simulator.now
+        self.first_stop: Optional[float] = None
+        self.stopped_time = 0.0  # Seconds spent decelerating so far
 
-        self.velocity: list[float] = [0, 0]
         road_dir = lane.road.direction
-        ran = random.randint(0, 3)
-        ran += 1
+        ran = gap or rng.randint(1, 4)
         self.is_turning = False
         self.turn_progress = 0.0
         self.turn_speed = 1
@@ -988,10 +1378,71 @@ class Car:
                 x + self.offset[0], y, self.size[0] * 2, self.size[1])
 
         self.orientation = self.ori_orientation
+        self.store.offset[self.index] = self.offset
+
+    @property
+    def x(self) -> float:
+        return self.store.position[self.index, 0]
+
+    @x.setter
+    def x(self, value: float) -> None:
+        self.store.position[self.index, 0] = value
+
+    @property
+    def y(self) -> float:
+        return self.store.position[self.index, 1]
+
+    @y.setter
+    def y(self, value: float) -> None:
+        self.store.position[self.index, 1] = value
+
+    @property
+    def velocity(self) -> np.ndarray:
+        return self.store.velocity[self.index]
+
+    @property
+    def _speed(self) -> float:
+        return self.store.speed[self.index]
+
+    @_speed.setter
+    def _speed(self, value: float) -> None:
+        self.store.speed[self.index] = value
+
+    @property
+    def state(self) -> int:
+        return self.store.state[self.index]
+
+    @state.setter
+    def state(self, value: int) -> None:
+        self.store.state[self.index] = value
+
+    @property
+    def orientation(self) -> float:
+        return self.store.orientation[self.index]
+
+    @orientation.setter
+    def orientation(self, value: float) -> None:
+        self.store.orientation[self.index] = value
+
+    @property
+    def color(self) -> int:
+        return int(self.store.color[self.index])
+
+    @color.setter
+    def color(self, value: int) -> None:
+        self.store.color[self.index] = value
+
+    @property
+    def is_turning(self) -> bool:
+        return bool(self.store.turning[self.index])
+
+    @is_turning.setter
+    def is_turning(self, value: bool) -> None:
+        self.store.turning[self.index] = value
 
     @property
     def speed(self) -> float:
-        return self._speed * self.simulator.speed
+        return self._speed
 
     @property
     def view(self) -> View:
@@ -1006,11 +1457,7 @@ class Car:
         return self.lane.direction
 
     def check(self) -> None:
-        cars = self.road.view.get_all_cars()
-        car_rects = [car.rect for car in cars if car is not self]
-        oppo_cars = self.opposite.cars
-        left_cars = self.left.cars
-        right_cars = self.right.cars
+        grid = self.view.grid
 
         if self.turned:
             self.accelerate()
@@ -1024,16 +1471,16 @@ class Car:
             if not self.road.is_active:
                 self.decelerate()
                 return
-            elif self.lookahead.collidelist(car_rects) != -1:
+            elif self.is_blocked(grid):
                 self.decelerate()
                 return
-            elif self.road.get_bound().collidelist(right_cars) != -1:
+            elif grid.collide(self.road.get_bound(), road=self.right) is not None:
                 self.decelerate()
                 return
             if self.lookahead.colliderect(self.left.rect):
-                car_index = self.opposite.get_bound().collidelist(left_cars)
-                if car_index != -1:
-                    if self.left.get_bound().colliderect(left_cars[car_index]):
+                left_bound = self.left.get_bound()
+                for car in grid.collide_all(self.opposite.get_bound(), road=self.left):
+                    if left_bound.colliderect(car.rect):
                         self.decelerate()
                         return
 
@@ -1041,10 +1488,10 @@ class Car:
             if isinstance(self.road, RoadTop) or isinstance(self.road, RoadLeft):
                 if self.rect.colliderect(self.road.get_bound()):
                     if self.lookahead.colliderect(self.left.get_bound()):
-                        car_indexes = self.opposite.get_bound().collidelistall(oppo_cars)
-                        for i in car_indexes:
-                            car = oppo_cars[i]
-                            if isinstance(oppo_cars[i].lane, LaneLeft):
+                        oppo_cars = grid.collide_all(
+                            self.opposite.get_bound(), road=self.opposite)
+                        for car in oppo_cars:
+                            if isinstance(car.lane, LaneLeft):
                                 if abs(car.x - car.lane.car_spawn[0]) > 500 or abs(car.y - car.lane.car_spawn[1]) > 400:
                                     self.decelerate()
                                     return
@@ -1052,92 +1499,66 @@ class Car:
                         self.accelerate()
             if self.rect.colliderect(self.right.get_bound()):
                 if not self.turned:
+                    if not self.is_turning:
+                        self.record(TraceRecorder.TURN)
                     self.is_turning = True
                     self._speed = self.speed_2
                     self.lookahead.width = 1
                     self.lookahead.height = 1
-                    randomm = random.randint(2000, 9000)
+                    randomm = self.simulator.rng.turn.randint(2000, 9000)
                     self.lookahead.y = self.rect.y + randomm
-                    self.turn_time = time.time()
-                car_index = self.right.get_bound().collidelist(oppo_cars)
-                if car_index != -1:
-                    cat = oppo_cars[car_index]
+                    self.turn_time = self.simulator.now
+                opposite_bound = self.opposite.get_bound()
+                for cat in grid.collide_all(self.right.get_bound(), road=self.opposite):
                     if isinstance(cat.lane, LaneStraight) or isinstance(cat.lane, LaneRight):
-                        if self.opposite.get_bound().colliderect(cat):
+                        if opposite_bound.colliderect(cat.rect):
                             self.decelerate()
                             return
         elif isinstance(self.lane, LaneRight):
             if self.rect.colliderect(self.left.get_bound()):
                 if not self.turned:
+                    if not self.is_turning:
+                        self.record(TraceRecorder.TURN)
                     self.is_turning = True
                     self.lookahead.width = 1
                     self.lookahead.height = 1
-                    randomm = random.randint(2000, 9000)
+                    randomm = self.simulator.rng.turn.randint(2000, 9000)
                     self.lookahead.x = self.rect.x + randomm
                     self._speed = self.speed_2
-                    self.turn_time = time.time()
-        if self.lookahead.collidelist(car_rects) != -1:
+                    self.turn_time = self.simulator.now
+        if self.is_blocked(grid):
             self.decelerate()
             return
         else:
             self.accelerate()
         return
 
+    def is_blocked(self, grid: SpatialGrid) -> bool:
+        # Nearly all braking is behind the lane leader, so try it first
+        if self.leader is not None and self.lookahead.colliderect(self.leader.rect):
+            return True
+        return grid.collide(self.lookahead, exclude=self) is not None
+
     def decelerate(self) -> None:
         if self.state == Car.ACCELERATING:
             self.state = Car.DECELERATING
-            self.time = time.time()
+            self.time = self.simulator.now
+            if self.first_stop is None:
+                self.first_stop = self.time
+            self.record(TraceRecorder.STOP)
 
     def accelerate(self) -> None:
         if self.state == Car.DECELERATING:
+            now = self.simulator.now
+            self.stopped_time += now - self.time
             self.state = Car.ACCELERATING
-            self.time = time.time()
-
-    def move(self):
-        if self.simulator.paused:
-            return
+            self.time = now
+            self.record(TraceRecorder.START)
 
-        dt = self.simulator.dt
-        game_speed = self.simulator.speed
-        current_time = time.time()
-        t = min(1, (current_time - self.time))
-
-        if self.is_turning:
-            self.update_turn()
-        orientation = self.snap_orientation(self.orientation)
-        radians = math.radians(orientation)
-        # Calculate the magnitude of velocity change
-
-        target_velocity_x = self.speed * math.cos(radians)
-        target_velocity_y = self.speed * math.sin(radians)
-
-        if self.state == Car.ACCELERATING:
-            # Smoothly interpolate towards the target velocity
-            self.velocity[0] = lerp(
-                self.velocity[0], target_velocity_x, dt, game_speed)
-            self.velocity[1] = lerp(
-                self.velocity[1], target_velocity_y, dt, game_speed)
-        elif self.state == Car.DECELERATING:
-            # Apply gradual deceleration
-            # Decelerating faster than accelerating
-            self.velocity[0] *= max(0, 1 - 5 * dt * game_speed)
-            self.velocity[1] *= max(0, 1 - 5 * dt * game_speed)
-
-        # Enforce speed limit
-        speed = math.hypot(self.velocity[0], self.velocity[1])
-        if speed > self.speed:
-            scaling_factor = self.speed / speed
-            self.velocity[0] *= scaling_factor
-            self.velocity[1] *= scaling_factor
-
-        # Update position based on new velocity
-        self.x += self.velocity[0] * dt
-        self.y += self.velocity[1] * dt
-
-        self.rect.x = int(self.x)
-        self.rect.y = int(self.y)
-        self.lookahead.x = self.rect.x + self.offset[0]
-        self.lookahead.y = self.rect.y + self.offset[1]
+    def record(self, code: int) -> None:
+        trace = self.simulator.trace
+        if trace is not None:
+            trace.car(self, code)
 
     def update_turn(self):
         # Calculate the current speed of the car
@@ -1145,10 +1566,9 @@ class Car:
 
         # Only allow the car to turn if it is moving
         if current_speed > 0 and not self.turned:
-            game_speed = self.simulator.speed
-            dt = self.simulator.dt
+            dt = self.simulator.time_step
             speed_ratio = current_speed / self.speed
-            turn_rate = self.turn_rate * speed_ratio * game_speed * dt * 60
+            turn_rate = self.turn_rate * speed_ratio * dt * 60
             if isinstance(self.lane, LaneLeft):
                 potential_orientation = self.orientation - turn_rate
             elif isinstance(self.lane, LaneRight):
@@ -1169,7 +1589,7 @@ class Car:
                     self.orientation = (self.ori_orientation + 90) % 360
 
             # Update turn progress, adjusting for the turn speed and direction multiplier
-            self.turn_progress += dt * self.turn_speed * speed_ratio * game_speed
+            self.turn_progress += dt * self.turn_speed * speed_ratio
 
             if self.turn_progress >= 1.0:
                 self.is_turning = False
@@ -1200,73 +1620,55 @@ class Car:
 
     def update(self) -> None:
         self.check()
-        self.rect = self.update_position()
+        self.update_zone()
         if abs(self.x - self.lane.car_spawn[0]) > 2000 or abs(self.y - self.lane.car_spawn[1]) > 2000:
-            self.lane.road.cars.remove(self)
+            if self.in_zone:
+                self.road.occupancy -= 1
+            self.record(TraceRecorder.EXIT)
+            self.record_metrics()
+            self.lane.remove(self)
+            self.store.remove(self.index)
             self.view.increment_car_leaves()
             del self
 
-    def update_position(self) -> pygame.Rect:
-        new_size = self.road.view.rect.size
-        original_size = self.old_view_rect
-
-        # Calculate scale factors based on the change in window size
-        scale_x = new_size[0] / original_size[0]
-        scale_y = new_size[1] / original_size[1]
-
-        # Scale the floating-point coordinates
-        self.x *= scale_x
-        self.y *= scale_y
-
-        # Update the rectangle for rendering using the scaled floating-point values
-        self.rect.x = int(self.x)
-        self.rect.y = int(self.y)
-
-        # Optionally scale the size of the rectangle if necessary
-        # self.rect.width = int(self.rect.width * scale_y)
-        # self.rect.height = int(self.rect.height * scale_y)
-
-        # Update the old view rectangle to the new size for future resizes
-        self.old_view_rect = new_size
-
-        return self.rect
-
-    def load_sprites(self) -> list[pygame.Surface]:
-        fn = f"{self.color}.png"
-        sprite_sheet = pygame.image.load(
-            os.path.join("Assets", "cars", fn)
-        ).convert_alpha()
-        sprite_w = 16
-        sprite_h = 16
-        sprite_num = sprite_sheet.get_width() // sprite_w
-
-        sprites = []
-
-        for i in range(sprite_num):
-            sprite = pygame.Surface((sprite_w, sprite_h), pygame.SRCALPHA)
-            sprite.blit(sprite_sheet, (0, 0),
-                        (i * sprite_w, 0, sprite_w, sprite_h))
-            scaled = pygame.transform.scale(
-                sprite, (self.size[0] + 10, self.size[1] + 10))
-            sprites.append(scaled)
-
-        self.sprites = sprites
-
-    def draw(self) -> None:
-        height = 1
-        if self.orientation == 90:  # Game's downward
+    def record_metrics(self) -> None:
+        now = self.simulator.now
+        delay = self.stopped_time
+        if self.state == Car.DECELERATING:
+            delay += now - self.time
+        self.view.metrics.record(
+            self.road.direction, self.road.lanes.index(self.lane), now - self.spawn_time, delay,
+            None if self.first_stop is None else self.first_stop - self.spawn_time)
+
+    def update_zone(self) -> None:
+        in_zone = self.rect.colliderect(self.road.get_half_bound())
+        if in_zone != self.in_zone:
+            self.in_zone = in_zone
+            self.road.occupancy += 1 if in_zone else -1
+
+    def draw(self) -> pygame.Rect:
+        view = self.view
+        return Car.blit(self.simulator.window, self.color, view.sprite_size,
+                        self.orientation, *view.to_screen(self.rect.x, self.rect.y))
+
+    @staticmethod
+    def blit(window: pygame.Surface,
+             color: int,
+             sprite_size: tuple[int, int],
+             orientation: float,
+             x: int,
+             y: int,
+             ) -> pygame.Rect:
+        """Draw a car's sprite stack with its rect's corner at screen x, y."""
+        if orientation == 90:  # Game's downward
             render_angle = 270
-        elif self.orientation == 270:  # Game's upward
+        elif orientation == 270:  # Game's upward
             render_angle = 90
         else:
-            render_angle = self.orientation
-        for i, img in enumerate(self.sprites):
-            rotated_img = pygame.transform.rotate(img, render_angle)
-            x = self.rect.x
-            y = self.rect.y - i * height
-
-            self.simulator.window.blit(rotated_img, (x, y))
-        # pygame.draw.rect(self.road.window, Color.GREEN, self.rects)
+            render_angle = orientation
+        stack = CarSprites.get(color, sprite_size, render_angle)
+        rise = CarSprites.rise(color, sprite_size)
+        return window.blit(stack, (x, y - rise))
 
 
 class State:
@@ -1286,41 +1688,71 @@ class State:
 
 class TrafficLight:
 
+    TRANSITION_TIME = 4.0  # Seconds spent in YELLOW and PRE_GREEN
+
     def __init__(self, road: Road, state: State.Light = State.Light.RED) -> None:
         self.road = road
         self.state = state
+        self.drawn_state = None
         self.time = 0.0
+        self.event: Optional[Event] = None  # The pending settle()
 
     def toggle(self) -> None:
+        sim = self.road.view.sim
         if self.state == State.Light.GREEN:
             self.state = State.Light.YELLOW
-            self.time = time.time()
         elif self.state == State.Light.RED:
             self.state = State.Light.PRE_GREEN
-            self.time = time.time()
+        else:
+            return
+        self.time = sim.now
+        self.event = sim.events.schedule(sim.now + TrafficLight.TRANSITION_TIME, self.settle)
+        self.record()
 
-    def update(self) -> None:
+    def settle(self) -> None:
+        """End the YELLOW or PRE_GREEN transition started by toggle()."""
+        self.event = None
         if self.state == State.Light.YELLOW:
-            if (time.time() - self.time) * self.road.view.sim.speed > 4:
-                self.state = State.Light.RED
+            self.state = State.Light.RED
         elif self.state == State.Light.PRE_GREEN:
-            if (time.time() - self.time) * self.road.view.sim.speed > 4:
-                self.state = State.Light.GREEN
+            self.state = State.Light.GREEN
+        else:
+            return
+        self.record()
 
-    def color(self) -> list[tuple[int, int, int]]:
-        if self.state == State.Light.YELLOW:
+    def record(self) -> None:
+        trace = self.road.view.sim.trace
+        if trace is not None:
+            trace.light(self)
+
+    def color(self, state: Optional[int] = None) -> list[tuple[int, int, int]]:
+        state = self.state if state is None else state
+        if state == State.Light.YELLOW:
             return [Color.INACTIVE_RED, Color.YELLOW, Color.INACTIVE_GREEN]
-        elif self.state == State.Light.GREEN:
+        elif state == State.Light.GREEN:
             return [Color.INACTIVE_RED, Color.INACTIVE_YELLOW, Color.GREEN]
         else:
             return [Color.RED, Color.INACTIVE_YELLOW, Color.INACTIVE_GREEN]
 
-    def draw(self) -> None:
+    @property
+    def rect(self) -> pygame.Rect:
+        view = self.road.view
+        x, y = self.road.get_light_coords()
+        return view.rect_to_screen(pygame.Rect(x - 10, y - 10, 20, 70))
+
+    def changed(self, state: Optional[int] = None) -> bool:
+        return (self.state if state is None else state) != self.drawn_state
+
+    def draw(self, state: Optional[int] = None) -> None:
+        """Draw the light in its current state, or in state from a Snapshot."""
+        state = self.state if state is None else state
+        self.drawn_state = state
+        view = self.road.view
         x, y = self.road.get_light_coords()
-        colors = self.color()
-        pygame.draw.circle(self.road.window, colors[0], (x, y), 10)
-        pygame.draw.circle(self.road.window, colors[1], (x, y + 25), 10)
-        pygame.draw.circle(self.road.window, colors[2], (x, y + 50), 10)
+        colors = self.color(state)
+        radius = 10 * view.scale
+        for i, color in enumerate(colors):
+            pygame.draw.circle(self.road.window, color, view.to_screen(x, y + 25 * i), radius)
 
 
 class Color:
@@ -1339,6 +1771,7 @@ class Color:
     MENU_BG = (1, 1, 1)
 
     GRASS = (60, 150, 60)
+    GRASS_DARK = (49, 92, 46)
     BUTTON = (90, 90, 90)
     BUTTON_HOVER = (150, 150, 150)
 
@@ -1432,14 +1865,18 @@ class UIElement:
     def hide(self) -> bool:
         self.hidden = True
 
+    def changed(self) -> bool:
+        """Whether the element would look different if drawn now."""
+        return True
+
     def show(self) -> bool:
         self.hidden = False
 
     def update(self) -> None:
         v_width, v_height = self.view.width, self.view.height
         x, y = self.offset
-        x += self.view.rect.x
-        y += self.view.rect.y
+        x += self.view.screen_rect.x
+        y += self.view.screen_rect.y
         m = self.margin
 
         # Determine outer anchor positions
@@ -1503,7 +1940,8 @@ class UIElement:
                 self.rect.bottom = outer_y
 
     @abstractmethod
-    def draw(self) -> None:
+    def draw(self, batch: Optional[list] = None) -> None:
+        """Draw the element, or append its (surface, position) blits to batch."""
         ...
 
 
@@ -1529,6 +1967,7 @@ class Text(UIElement):
                  ) -> None:
         self.font = font
         self.text = text
+        self.text_to_display: Optional[str] = None
         super().__init__(sim, view,
                          name=name,
                          anchor=anchor,
@@ -1543,28 +1982,33 @@ class Text(UIElement):
                          )
 
     def update(self) -> None:
-        self.text_to_display = self.text(self.sim) if callable(
-            self.text) else self.text
-
-        self.text_surface = self.font.render(
-            self.text_to_display, True, self.color)
-
-        self.text_width, self.text_height = self.text_surface.get_size()
+        text = self.get_text()
+        if text != self.text_to_display:
+            self.text_to_display = text
+            self.text_surface = Fonts.render(self.font, text, self.color)
+            self.text_width, self.text_height = self.text_surface.get_size()
 
         self.rect.width = self.text_width
         self.rect.height = self.text_height
 
+        super().update()
         self.text_x = self.rect.x
         self.text_y = self.rect.y
-        super().update()
 
-    def draw(self) -> None:
-        if self.sim.needs_refresh:
-            self.update()
-        self.sim.window.fill(self.background_color, self.rect)
+    def get_text(self) -> str:
+        return self.text(self.sim) if callable(self.text) else self.text
+
+    def changed(self) -> bool:
+        return self.get_text() != self.text_to_display
+
+    def draw(self, batch: Optional[list] = None) -> None:
         self.update()
-        self.sim.window.blit(self.text_surface, (self.text_x, self.text_y))
-        pygame.display.update(self.rect)
+        self.sim.window.fill(self.background_color, self.rect)
+        blit = (self.text_surface, (self.text_x, self.text_y))
+        if batch is None:
+            self.sim.window.blit(*blit)
+        else:
+            batch.append(blit)
 
 
 class Button(UIElement):
@@ -1596,6 +2040,8 @@ class Button(UIElement):
         self.hover_color = hover_color
         self.border_radius = border_radius
         self.action = action
+        self.drawn_text: Optional[str] = None
+        self.drawn_hover: Optional[bool] = None
         super().__init__(sim, view,
                          name=name,
                          anchor=anchor,
@@ -1612,20 +2058,29 @@ class Button(UIElement):
     def load(self) -> None:
         self.sim.add_button(self)
 
+    def get_text(self) -> str:
+        return self.text(self.sim) if callable(self.text) else self.text
+
+    def is_hovered(self) -> bool:
+        return self.rect.collidepoint(pygame.mouse.get_pos())
+
+    def changed(self) -> bool:
+        return self.get_text() != self.drawn_text or self.is_hovered() != self.drawn_hover
+
     def handle_event(self, event: pygame.event):
         mouse_pos = event.pos  # Get the position of the mouse when clicked
         if self.rect.collidepoint(mouse_pos):
             self.action(self.sim)  # Execute the button's action
 
-    def draw(self) -> None:
+    def draw(self, batch: Optional[list] = None) -> None:
         if self.sim.needs_refresh:
             self.update()
         surface = self.sim.window
-        text_to_display = self.text(self.sim) if callable(
-            self.text) else self.text
+        text_to_display = self.get_text()
+        self.drawn_text = text_to_display
 
         # Render the text
-        text_surface = self.font.render(text_to_display, True, self.color)
+        text_surface = Fonts.render(self.font, text_to_display, self.color)
 
         # Calculate text width and height
         text_width, text_height = text_surface.get_size()
@@ -1634,8 +2089,8 @@ class Button(UIElement):
         text_x = self.rect.x + (self.rect.width - text_width) // 2
         text_y = self.rect.y + (self.rect.height - text_height) // 2
 
-        mouse_pos = pygame.mouse.get_pos()
-        if self.rect.collidepoint(mouse_pos):
+        self.drawn_hover = self.is_hovered()
+        if self.drawn_hover:
             color = self.hover_color
         else:
             color = self.button_color
@@ -1645,4 +2100,7 @@ class Button(UIElement):
                          border_radius=self.border_radius)
 
         # Blit the text onto the surface at the calculated position
-        surface.blit(text_surface, (text_x, text_y))
+        if batch is None:
+            surface.blit(text_surface, (text_x, text_y))
+        else:
+            batch.append((text_surface, (text_x, text_y)))
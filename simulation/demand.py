@@ -0,0 +1,181 @@
+"""
+Real demand streamed from detector files.
+
+Rows are read a chunk at a time, so memory stays flat however long the
+file is. Each row is either one arrival (a time and a road) or a count of
+arrivals on a road over an interval, spread uniformly across it:
+
+    sim = Simulator(seed=0)
+    sim.load_smart_light(base_offset=30)
+    sim.load_basic_light(value=50)
+    sim.stream(DemandFile("counts.csv", count_column="count",
+                          interval=900).arrivals(sim.rng.arrivals))
+    sim.run(30 * 24 * 60 * 60)
+
+CSV files must be numeric with a header row. Arrow IPC and Parquet files
+need pyarrow; .npy files hold a structured array and are memory-mapped.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+from typing import Iterator, Optional
+
+import numpy as np
+
+from .arrivals import ArrivalStream
+
+
+class DemandFile:
+    """
+    Arrival times or counts per road, read from a file in chunks.
+
+    Values of road_column are Road indices unless roads maps them (e.g.
+    detector ids) to one; rows for unmapped values are dropped. Times are
+    in seconds and shifted so that origin (by default the first time in
+    the file) is simulation time 0.
+    """
+
+    def __init__(self,
+                 path: str,
+                 *,
+                 time_column: str = "time",
+                 road_column: str = "road",
+                 count_column: Optional[str] = None,
+                 interval: Optional[float] = None,
+                 roads: Optional[dict[int, int]] = None,
+                 origin: Optional[float] = None,
+                 chunk_rows: int = 100_000,
+                 ) -> None:
+        if count_column is not None and interval is None:
+            raise ValueError("interval is required with count_column")
+        self.path = path
+        self.time_column = time_column
+        self.road_column = road_column
+        self.count_column = count_column
+        self.interval = interval
+        self.roads = roads
+        self.origin = origin
+        self.chunk_rows = chunk_rows
+
+    def columns(self) -> list[str]:
+        return [name for name in (self.time_column, self.road_column, self.count_column)
+                if name is not None]
+
+    def chunks(self) -> Iterator[dict[str, np.ndarray]]:
+        """Raw column arrays of up to chunk_rows rows at a time."""
+        extension = os.path.splitext(self.path)[1].lower()
+        if extension == ".csv":
+            return self._csv_chunks()
+        if extension == ".npy":
+            return self._npy_chunks()
+        if extension in (".arrow", ".feather", ".ipc", ".parquet"):
+            return self._arrow_chunks(extension)
+        raise ValueError(f"Unsupported demand file: {self.path}")
+
+    def arrivals(self, rng: np.random.Generator) -> Iterator[ArrivalStream]:
+        """
+        Consecutive ArrivalStreams covering the whole file, for
+        Simulator.stream. The file must be sorted by time.
+
+        Rows sharing the last time of a chunk are held back to the next
+        one, so every stream ends before the next one's first arrival.
+        """
+        origin = self.origin
+        held: Optional[dict[str, np.ndarray]] = None
+        for chunk in self.chunks():
+            chunk = self._select(chunk)
+            if held is not None:
+                chunk = {name: np.concatenate((held[name], chunk[name])) for name in chunk}
+            if not len(chunk["time"]):
+                continue
+            if origin is None:
+                origin = float(chunk["time"][0])
+            last = chunk["time"][-1]
+            tail = int(np.searchsorted(chunk["time"], last, side="left"))
+            held = {name: values[tail:] for name, values in chunk.items()}
+            if tail:
+                ready = {name: values[:tail] for name, values in chunk.items()}
+                yield self._stream(ready, origin, float(last) - origin, rng)
+        if held is not None and len(held["time"]):
+            yield self._stream(held, origin, None, rng)
+
+    def _select(self, chunk: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        time = np.asarray(chunk[self.time_column], dtype=np.float64)
+        road = np.asarray(chunk[self.road_column], dtype=np.int64)
+        count = (np.asarray(chunk[self.count_column], dtype=np.int64)
+                 if self.count_column is not None else np.ones(len(time), dtype=np.int64))
+        if self.roads is not None:
+            keys = np.fromiter(self.roads, dtype=np.int64, count=len(self.roads))
+            values = np.fromiter(self.roads.values(), dtype=np.int64, count=len(self.roads))
+            order = np.argsort(keys)
+            keys, values = keys[order], values[order]
+            index = np.clip(np.searchsorted(keys, road), 0, len(keys) - 1)
+            mapped = keys[index] == road
+            time, road, count = time[mapped], values[index[mapped]], count[mapped]
+        return {"time": time, "road": road, "count": count}
+
+    def _stream(self,
+                rows: dict[str, np.ndarray],
+                origin: float,
+                end: Optional[float],
+                rng: np.random.Generator,
+                ) -> ArrivalStream:
+        time = rows["time"] - origin
+        road = rows["road"]
+        if self.count_column is not None:
+            count = np.maximum(rows["count"], 0)
+            time = np.repeat(time, count) + rng.random(count.sum()) * self.interval
+            road = np.repeat(road, count)
+        order = np.argsort(time, kind="stable")
+        stream = ArrivalStream.with_attributes(time[order], road[order], rng)
+        if end is not None:
+            # Counts spread past the next chunk's first row are spawned late
+            # rather than dropped
+            stream.end = max(end, stream.end)
+        return stream
+
+    def _csv_chunks(self) -> Iterator[dict[str, np.ndarray]]:
+        with open(self.path, newline="") as file:
+            header = [name.strip() for name in file.readline().split(",")]
+            usecols = [header.index(name) for name in self.columns()]
+            while True:
+                lines = list(itertools.islice(file, self.chunk_rows))
+                if not lines:
+                    return
+                table = np.loadtxt(lines, delimiter=",", usecols=usecols, ndmin=2)
+                yield dict(zip(self.columns(), table.T))
+
+    def _npy_chunks(self) -> Iterator[dict[str, np.ndarray]]:
+        table = np.load(self.path, mmap_mode="r")
+        for start in range(0, len(table), self.chunk_rows):
+            rows = table[start:start + self.chunk_rows]
+            yield {name: np.asarray(rows[name]) for name in self.columns()}
+
+    def _arrow_chunks(self, extension: str) -> Iterator[dict[str, np.ndarray]]:
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError(f"Reading {extension} demand files requires pyarrow") from e
+
+        if extension == ".parquet":
+            import pyarrow.parquet
+
+            batches = pyarrow.parquet.ParquetFile(self.path).iter_batches(
+                batch_size=self.chunk_rows, columns=self.columns())
+        else:
+            import pyarrow.ipc
+
+            source = pyarrow.memory_map(self.path)
+            try:
+                reader = pyarrow.ipc.open_file(source)
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+            except pyarrow.ArrowInvalid:
+                source.seek(0)
+                batches = pyarrow.ipc.open_stream(source)
+
+        for batch in batches:
+            for start in range(0, batch.num_rows, self.chunk_rows):
+                rows = batch.slice(start, self.chunk_rows)
+                yield {name: rows.column(name).to_numpy(zero_copy_only=False)
+                       for name in self.columns()}
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from .classes import Simulator
+
+
+class Event:
+
+    __slots__ = ("time", "order", "callback", "args", "cancelled")
+
+    def __init__(self, time: float, order: int, callback: Callable, args: tuple) -> None:
+        self.time = time
+        self.order = order
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other: Event) -> bool:
+        return (self.time, self.order) < (other.time, other.order)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class EventQueue:
+    """
+    Time-triggered callbacks on the simulation clock.
+
+    Events due at the same time fire in the order they were scheduled.
+    Cancelled events stay in the heap and are skipped when they come up.
+    """
+
+    def __init__(self) -> None:
+        self.heap: list[Event] = []
+        self.counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def schedule(self, time: float, callback: Callable, *args) -> Event:
+        event = Event(time, next(self.counter), callback, args)
+        heapq.heappush(self.heap, event)
+        return event
+
+    def next_time(self) -> float:
+        """Time of the next live event, inf when there is none."""
+        while self.heap and self.heap[0].cancelled:
+            heapq.heappop(self.heap)
+        return self.heap[0].time if self.heap else math.inf
+
+    def run_until(self, sim: Simulator, time: float) -> None:
+        """
+        Fire every event due by time, each with sim.now set to its own
+        time, then leave the clock at time.
+        """
+        while self.next_time() <= time:
+            event = heapq.heappop(self.heap)
+            sim.now = max(sim.now, event.time)
+            event.callback(*event.args)
+        sim.now = time
+
+    def clear(self) -> None:
+        self.heap.clear()
@@ -0,0 +1,229 @@
+"""
+Streaming per-vehicle metrics.
+
+Every car that leaves adds its travel time, delay (seconds spent braking
+or stopped) and time to its first stop to the stats of its road and lane.
+Each measure keeps a running mean and variance and a quantile sketch, so
+memory does not grow with the length of the run, and metrics from
+separate runs or processes can be merged:
+
+    total = VehicleMetrics()
+    for row_metrics in results:
+        total.merge(row_metrics)
+    total.total()["delay"].quantile(0.95)
+"""
+from __future__ import annotations
+
+import math
+from typing import Optional
+
+MEASURES = ("travel_time", "delay", "first_stop")
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RunningStats:
+    """Count, mean and variance by Welford's method, mergeable by Chan's."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: RunningStats) -> None:
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class QuantileSketch:
+    """
+    Quantiles within relative_accuracy of the true value, from counts in
+    logarithmic buckets (as in DDSketch).
+
+    Values up to min_value count as zero. At most max_buckets buckets are
+    kept; past that the lowest ones are folded together, which only costs
+    accuracy at the bottom end.
+    """
+
+    def __init__(self,
+                 relative_accuracy: float = 0.01,
+                 min_value: float = 1e-3,
+                 max_buckets: int = 2048,
+                 ) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value: float, count: int = 1) -> None:
+        self.count += count
+        if value <= self.min_value:
+            self.zeros += count
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def merge(self, other: QuantileSketch) -> None:
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self.count += other.count
+        self.zeros += other.zeros
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        keys = sorted(self.buckets)
+        excess = keys[:len(keys) - self.max_buckets + 1]
+        self.buckets[keys[len(excess)]] += sum(self.buckets.pop(key) for key in excess)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of the bucket, relative_accuracy from either end
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class Metric:
+    """Running stats and a quantile sketch of one measure."""
+
+    def __init__(self) -> None:
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch()
+
+    def add(self, value: float) -> None:
+        self.stats.add(value)
+        self.sketch.add(value)
+
+    def merge(self, other: Metric) -> None:
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def count(self) -> int:
+        return self.stats.count
+
+    @property
+    def mean(self) -> float:
+        return self.stats.mean if self.stats.count else math.nan
+
+    def quantile(self, q: float) -> float:
+        return self.sketch.quantile(q)
+
+    def to_dict(self) -> dict:
+        stats, sketch = self.stats, self.sketch
+        return {"count": stats.count, "mean": stats.mean, "m2": stats.m2,
+                "min": stats.min, "max": stats.max, "zeros": sketch.zeros,
+                "buckets": sorted(sketch.buckets.items())}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> Metric:
+        metric = cls()
+        stats, sketch = metric.stats, metric.sketch
+        stats.count, stats.mean, stats.m2 = state["count"], state["mean"], state["m2"]
+        stats.min, stats.max = state["min"], state["max"]
+        sketch.count, sketch.zeros = state["count"], state["zeros"]
+        sketch.buckets = {key: count for key, count in state["buckets"]}
+        return metric
+
+
+class VehicleMetrics:
+    """
+    The measures of every car that left one View, per road and lane.
+
+    total() merges them up to a whole road, a lane across roads or the
+    whole intersection, i.e. the controller running it.
+    """
+
+    def __init__(self) -> None:
+        self.lanes: dict[tuple[int, int], dict[str, Metric]] = {}
+
+    def record(self,
+               road: int,
+               lane: int,
+               travel_time: float,
+               delay: float,
+               first_stop: Optional[float],
+               ) -> None:
+        metrics = self.lanes.get((road, lane))
+        if metrics is None:
+            metrics = self.lanes[(road, lane)] = {name: Metric() for name in MEASURES}
+        metrics["travel_time"].add(travel_time)
+        metrics["delay"].add(delay)
+        if first_stop is not None:
+            metrics["first_stop"].add(first_stop)
+
+    def total(self, road: Optional[int] = None, lane: Optional[int] = None) -> dict[str, Metric]:
+        totals = {name: Metric() for name in MEASURES}
+        for (r, l), metrics in self.lanes.items():
+            if (road is None or r == road) and (lane is None or l == lane):
+                for name in MEASURES:
+                    totals[name].merge(metrics[name])
+        return totals
+
+    def merge(self, other: VehicleMetrics) -> None:
+        for key, metrics in other.lanes.items():
+            mine = self.lanes.setdefault(key, {name: Metric() for name in MEASURES})
+            for name in MEASURES:
+                mine[name].merge(metrics[name])
+
+    def summary(self, road: Optional[int] = None, lane: Optional[int] = None) -> dict[str, float]:
+        """Mean and p50/p95/p99 of delay and travel time, e.g. for a sweep row."""
+        totals = self.total(road, lane)
+        row = {}
+        for name in ("delay", "travel_time"):
+            row[f"{name}_mean"] = round(totals[name].mean, 3)
+            for q in QUANTILES:
+                row[f"{name}_p{round(q * 100)}"] = round(totals[name].quantile(q), 3)
+        return row
+
+    def to_dict(self) -> dict:
+        return {"lanes": [[road, lane, {name: metric.to_dict() for name, metric in metrics.items()}]
+                          for (road, lane), metrics in self.lanes.items()]}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> VehicleMetrics:
+        metrics = cls()
+        for road, lane, measures in state["lanes"]:
+            metrics.lanes[(road, lane)] = {name: Metric.from_dict(measure)
+                                           for name, measure in measures.items()}
+        return metrics
@@ -0,0 +1,155 @@
+"""
+Monte Carlo replications of one scenario with confidence intervals.
+
+Seeds are run in parallel batches until the confidence interval of every
+controller's leaves per minute is tight enough. From the repository root:
+
+    python -m simulation.replication --preset scenario_1 --base-offset 30 \\
+        --value 50 --precision 0.02 --duration 1800
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .metrics import VehicleMetrics
+from .sweep import BASIC_PARAMS, PRESETS, SMART_PARAMS, run_scenario
+
+CONTROLLERS = ("smart", "basic")
+
+
+def t_quantile(p: float, df: int) -> float:
+    """
+    Student's t quantile via the Cornish-Fisher expansion of the normal one.
+
+    Within about 1% for df >= 3, which is plenty for a stopping rule.
+    """
+    z = statistics.NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+def confidence_interval(values: list[float], confidence: float = 0.95) -> tuple[float, float]:
+    """Return (mean, half width) of the two-sided interval for the mean."""
+    n = len(values)
+    mean = statistics.fmean(values)
+    if n < 2:
+        return mean, math.inf
+    stdev = statistics.stdev(values)
+    return mean, t_quantile(0.5 + confidence / 2, n - 1) * stdev / math.sqrt(n)
+
+
+def _run(job: dict) -> dict:
+    return run_scenario(**job)
+
+
+def replicate(smart: Optional[dict] = None,
+              basic: Optional[dict] = None,
+              preset: str = "default",
+              *,
+              duration: float = 600.0,
+              dt: float = 1 / 60,
+              spawn_multiplier: float = 1.0,
+              confidence: float = 0.95,
+              precision: float = 0.05,
+              min_replications: int = 5,
+              max_replications: int = 200,
+              first_seed: int = 0,
+              processes: Optional[int] = None,
+              ) -> dict:
+    """
+    Replicate a scenario over consecutive seeds until converged.
+
+    Stops once every controller's interval half width is within precision
+    times its mean, or after max_replications runs.
+
+    Returns
+    -------
+    dict
+        Per controller: mean, half_width, n, the raw values and the
+        vehicle metrics of every replication merged.
+    """
+    processes = processes or os.cpu_count()
+    values: dict[str, list[float]] = {name: [] for name in CONTROLLERS}
+    metrics = {name: VehicleMetrics() for name in CONTROLLERS}
+    summary: dict[str, dict] = {}
+    seed = first_seed
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        while True:
+            n = len(values[CONTROLLERS[0]])
+            batch = max(processes, min_replications - n)
+            batch = min(batch, max_replications - n)
+            jobs = [dict(smart=smart, basic=basic, preset=preset,
+                         duration=duration, dt=dt,
+                         spawn_multiplier=spawn_multiplier, seed=seed + i,
+                         with_metrics=True)
+                    for i in range(batch)]
+            seed += batch
+            for row in pool.map(_run, jobs):
+                for name in CONTROLLERS:
+                    values[name].append(row[f"{name}_leaves_per_min"])
+                    metrics[name].merge(row[f"{name}_metrics"])
+
+            converged = True
+            for name in CONTROLLERS:
+                mean, half_width = confidence_interval(values[name], confidence)
+                summary[name] = dict(mean=mean, half_width=half_width,
+                                     n=len(values[name]), values=values[name],
+                                     metrics=metrics[name])
+                if half_width > precision * abs(mean):
+                    converged = False
+
+            n = len(values[CONTROLLERS[0]])
+            if n >= max_replications or (converged and n >= min_replications):
+                return summary
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    for name in SMART_PARAMS + BASIC_PARAMS:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float)
+    parser.add_argument("--preset", default="default", choices=PRESETS)
+    parser.add_argument("--duration", type=float, default=600.0,
+                        help="simulated seconds per replication")
+    parser.add_argument("--dt", type=float, default=1 / 60)
+    parser.add_argument("--spawn-multiplier", type=float, default=1.0)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--precision", type=float, default=0.05,
+                        help="target half width relative to the mean")
+    parser.add_argument("--min-replications", type=int, default=5)
+    parser.add_argument("--max-replications", type=int, default=200)
+    parser.add_argument("--processes", type=int)
+    args = vars(parser.parse_args(argv))
+
+    summary = replicate(
+        {name: args[name] for name in SMART_PARAMS if args[name] is not None},
+        {name: args[name] for name in BASIC_PARAMS if args[name] is not None},
+        args["preset"],
+        duration=args["duration"],
+        dt=args["dt"],
+        spawn_multiplier=args["spawn_multiplier"],
+        confidence=args["confidence"],
+        precision=args["precision"],
+        min_replications=args["min_replications"],
+        max_replications=args["max_replications"],
+        processes=args["processes"],
+    )
+    for name, result in summary.items():
+        print(f"{name}: {result['mean']:.3f} ± {result['half_width']:.3f} "
+              f"leaves/min ({result['n']} replications, "
+              f"{args['confidence']:.0%} CI)")
+        delay = result["metrics"].summary()
+        print(f"  delay: mean {delay['delay_mean']:.1f}s, p50 {delay['delay_p50']:.1f}s, "
+              f"p95 {delay['delay_p95']:.1f}s, p99 {delay['delay_p99']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+import pygame
+
+if TYPE_CHECKING:
+    from .classes import Simulator, View
+
+
+class Snapshot:
+    """
+    Read-only copy of what the renderer needs from one simulation state.
+
+    Taken by the simulation thread after each batch of steps, so drawing
+    never reads arrays the simulation is writing to.
+    """
+
+    def __init__(self,
+                 now: float,
+                 stamp: float,
+                 serial: np.ndarray,
+                 view: np.ndarray,
+                 color: np.ndarray,
+                 position: np.ndarray,
+                 orientation: np.ndarray,
+                 lights: tuple[tuple[int, ...], ...],
+                 ) -> None:
+        self.now = now
+        self.stamp = stamp  # perf_counter() when taken
+        self.serial = serial
+        self.view = view
+        self.color = color
+        self.position = position
+        self.orientation = orientation
+        self.lights = lights
+        for array in (serial, view, color, position, orientation):
+            array.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self.serial)
+
+    @classmethod
+    def capture(cls, sim: Simulator, stamp: float) -> Snapshot:
+        store = sim.vehicles
+        rows = np.flatnonzero(store.active[:store.size])
+        return cls(
+            now=sim.now,
+            stamp=stamp,
+            serial=store.serial[rows],
+            view=store.view[rows],
+            color=store.color[rows],
+            position=store.position[rows],
+            orientation=store.orientation[rows],
+            lights=tuple(tuple(road.light.state for road in view) for view in sim.views),
+        )
+
+    def interpolate(self, previous: Optional[Snapshot], alpha: float) -> Snapshot:
+        """
+        Positions alpha of the way from previous to this snapshot. Cars that
+        only exist here are drawn where they are.
+        """
+        if previous is None or alpha >= 1.0 or not len(previous) or not len(self):
+            return self
+        order = np.argsort(previous.serial)
+        found = np.searchsorted(previous.serial, self.serial, sorter=order)
+        found = order[np.minimum(found, len(order) - 1)]
+        matched = previous.serial[found] == self.serial
+
+        position = self.position.copy()
+        start = previous.position[found[matched]]
+        position[matched] = start + (self.position[matched] - start) * alpha
+        return Snapshot(self.now, self.stamp, self.serial, self.view, self.color,
+                        position, self.orientation, self.lights)
+
+    def draw_cars(self, window: pygame.Surface, view: View) -> list[pygame.Rect]:
+        from .classes import Car
+
+        rows = np.flatnonzero(self.view == view.index)
+        # Same transform as View.to_screen, for all of the view's cars at once
+        world = self.position[rows].astype(np.int64)
+        centre = np.array(view.rect.center)
+        corners = (np.array(view.screen_rect.center) + (world - centre) * view.scale)
+        corners = corners.astype(np.int64).tolist()
+        sprite_size = view.sprite_size
+        return [Car.blit(window, color, sprite_size, orientation, x, y)
+                for color, orientation, (x, y) in zip(self.color[rows].tolist(),
+                                                      self.orientation[rows].tolist(),
+                                                      corners)]
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+import pygame
+
+if TYPE_CHECKING:
+    from .classes import Car, Road
+
+
+class SpatialGrid:
+    """
+    Uniform grid of cars bucketed by the cells their rect overlaps.
+
+    Rebuilt once per tick so neighbour queries only look at the cells a
+    rect covers instead of every car in the view.
+    """
+
+    CELL_SIZE = 64
+
+    def __init__(self, cell_size: int = CELL_SIZE) -> None:
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[Car]] = {}
+
+    def rebuild(self, cars: Iterable[Car]) -> None:
+        cells: dict[tuple[int, int], list[Car]] = {}
+        size = self.cell_size
+        for car in cars:
+            rect = car.rect
+            x0, x1 = rect.left // size, (rect.right - 1) // size
+            y0, y1 = rect.top // size, (rect.bottom - 1) // size
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cell = cells.get((cx, cy))
+                    if cell is None:
+                        cells[(cx, cy)] = [car]
+                    else:
+                        cell.append(car)
+        self.cells = cells
+
+    def query(self, rect: pygame.Rect) -> Iterator[Car]:
+        """Yield each car sharing a cell with rect once, nearest cells first."""
+        size = self.cell_size
+        cells = self.cells
+        x0, x1 = rect.left // size, (rect.right - 1) // size
+        y0, y1 = rect.top // size, (rect.bottom - 1) // size
+        seen = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                for car in cells.get((cx, cy), ()):
+                    if car.index not in seen:
+                        seen.add(car.index)
+                        yield car
+
+    def collide_all(self,
+                    rect: pygame.Rect,
+                    *,
+                    exclude: Optional[Car] = None,
+                    road: Optional[Road] = None,
+                    ) -> list[Car]:
+        return [car for car in self.query(rect)
+                if car is not exclude
+                and (road is None or car.road is road)
+                and rect.colliderect(car.rect)]
+
+    def collide(self,
+                rect: pygame.Rect,
+                *,
+                exclude: Optional[Car] = None,
+                road: Optional[Road] = None,
+                ) -> Optional[Car]:
+        for car in self.query(rect):
+            if car is exclude or (road is not None and car.road is not road):
+                continue
+            if rect.colliderect(car.rect):
+                return car
+        return None
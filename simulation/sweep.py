@@ -0,0 +1,201 @@
+"""
+Parameter sweeps over the Smart and Basic light controllers.
+
+Every run is an independent headless Simulator, fanned out over a process
+pool. From the repository root:
+
+    python -m simulation.sweep --base-offset 10 30 50 --value 50 120 \\
+        --preset scenario_1 scenario_2 --duration 1800 --out sweep.csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+
+from .arrivals import ArrivalStream
+from .classes import Simulator
+from .trace import TraceRecorder, TrajectoryRecorder
+
+# Per-road spawn multipliers (r1..r4), matching the buttons in main.py
+PRESETS: dict[str, tuple[float, float, float, float]] = {
+    "default": (1.0, 1.0, 1.0, 1.0),
+    "scenario_1": (2.0, 1.0, 2.0, 1.0),
+    "scenario_2": (2.0, 0.1, 2.0, 0.1),
+}
+
+SMART_PARAMS = ("max_value", "base_offset", "increment_value",
+                "no_traffic_multiplier", "value_per_car")
+BASIC_PARAMS = ("value",)
+
+
+def grid(**axes: Iterable) -> list[dict]:
+    """Cartesian product of keyword axes, e.g. grid(base_offset=[10, 30])."""
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*axes.values())]
+
+
+def run_scenario(smart: Optional[dict] = None,
+                 basic: Optional[dict] = None,
+                 preset: str = "default",
+                 duration: float = 600.0,
+                 dt: float = 1 / 60,
+                 spawn_multiplier: float = 1.0,
+                 seed: Optional[int] = None,
+                 trace: Optional[str] = None,
+                 trajectory: Optional[str] = None,
+                 with_metrics: bool = False,
+                 ) -> dict:
+    """
+    Run one headless simulation and return its metrics as a table row.
+
+    Passing trace records the run's events to that directory, see TraceRecorder,
+    and trajectory its cars and lights for main.py --replay. with_metrics
+    adds each view's VehicleMetrics, for merging with other runs.
+    """
+    smart = smart or {}
+    basic = basic or {}
+
+    sim = Simulator(seed=seed)
+    sim.load_smart_light(**smart)
+    sim.load_basic_light(**basic)
+    sim.multiplier = spawn_multiplier
+    sim.set_preset(*PRESETS[preset])
+    if trace is not None:
+        sim.trace = TraceRecorder(trace)
+    if trajectory is not None:
+        sim.trajectory = TrajectoryRecorder(trajectory)
+    try:
+        sim.run(duration, dt)
+    finally:
+        for recorder in (sim.trace, sim.trajectory):
+            if recorder is not None:
+                recorder.close()
+
+    minutes = sim.now / 60
+    row = {f"smart_{key}": value for key, value in smart.items()}
+    row.update({f"basic_{key}": value for key, value in basic.items()})
+    row.update(preset=preset, seed=seed, duration=duration)
+    for name, view in (("smart", sim.view_1), ("basic", sim.view_2)):
+        row[f"{name}_leaves_per_min"] = round(view.car_leaves / minutes, 3)
+        row[f"{name}_cars_left_in_view"] = sum(len(road.cars) for road in view)
+        row.update({f"{name}_{key}": value for key, value in view.metrics.summary().items()})
+        if with_metrics:
+            row[f"{name}_metrics"] = view.metrics
+    return row
+
+
+def compare(controllers: list[dict],
+            preset: str = "default",
+            duration: float = 600.0,
+            dt: float = 1 / 60,
+            spawn_multiplier: float = 1.0,
+            seed: Optional[int] = None,
+            ) -> list[dict]:
+    """
+    Run K controllers side by side on one shared arrival stream.
+
+    Each entry of controllers is the keyword arguments of load_smart_light,
+    or of load_basic_light when it has a "value" key. Every controller gets
+    its own intersection and sees exactly the same cars, so differences
+    between the rows come from the controllers alone.
+    """
+    sim = Simulator(seed=seed)
+    sim.multiplier = spawn_multiplier
+    sim.set_preset(*PRESETS[preset])
+    sim.replay(ArrivalStream.poisson(sim.arrival_rates(), duration, sim.rng.arrivals))
+
+    views = list(sim.views)
+    while len(views) < len(controllers):
+        views.append(sim.add_view())
+    for view, params in zip(views, controllers):
+        if "value" in params:
+            sim.load_basic_light(**params, view=view)
+        else:
+            sim.load_smart_light(**params, view=view)
+    sim.run(duration, dt)
+
+    minutes = sim.now / 60
+    rows = []
+    for params, view in zip(controllers, sim.views):
+        row = {"controller": "basic" if "value" in params else "smart", **params}
+        row.update(preset=preset, seed=seed, duration=duration)
+        row["leaves_per_min"] = round(view.car_leaves / minutes, 3)
+        row["cars_left_in_view"] = sum(len(road.cars) for road in view)
+        row.update(view.metrics.summary())
+        rows.append(row)
+    return rows
+
+
+def _run(job: dict) -> dict:
+    return run_scenario(**job)
+
+
+def sweep(smart_configs: Iterable[dict] = ({},),
+          basic_configs: Iterable[dict] = ({},),
+          presets: Iterable[str] = ("default",),
+          *,
+          duration: float = 600.0,
+          dt: float = 1 / 60,
+          spawn_multiplier: float = 1.0,
+          seeds: Iterable[int] = (0,),
+          processes: Optional[int] = None,
+          ) -> list[dict]:
+    """
+    Run every smart x basic x preset combination on each of seeds across a
+    process pool. Runs with the same seed and preset see the same traffic.
+    """
+    jobs = [dict(smart=smart, basic=basic, preset=preset, duration=duration,
+                 dt=dt, spawn_multiplier=spawn_multiplier, seed=seed)
+            for smart, basic, preset, seed in itertools.product(
+                smart_configs, basic_configs, presets, seeds)]
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        return list(pool.map(_run, jobs))
+
+
+def write_table(rows: list[dict], path: Optional[str] = None) -> None:
+    """Write rows as CSV to path, or to stdout when no path is given."""
+    if not rows:
+        return
+    fields = list(dict.fromkeys(key for row in rows for key in row))
+    file = open(path, "w", newline="") if path else sys.stdout
+    try:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if path:
+            file.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    for name in SMART_PARAMS + BASIC_PARAMS:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, nargs="+")
+    parser.add_argument("--preset", nargs="+", default=["default"], choices=PRESETS)
+    parser.add_argument("--duration", type=float, default=600.0,
+                        help="simulated seconds per run")
+    parser.add_argument("--dt", type=float, default=1 / 60)
+    parser.add_argument("--spawn-multiplier", type=float, default=1.0)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0],
+                        help="every configuration runs once per seed")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--out", help="CSV file to write, stdout if omitted")
+    args = vars(parser.parse_args(argv))
+
+    smart_axes = {name: args[name] for name in SMART_PARAMS if args[name]}
+    basic_axes = {name: args[name] for name in BASIC_PARAMS if args[name]}
+    rows = sweep(grid(**smart_axes), grid(**basic_axes), args["preset"],
+                 duration=args["duration"], dt=args["dt"],
+                 spawn_multiplier=args["spawn_multiplier"],
+                 seeds=args["seeds"],
+                 processes=args["processes"])
+    write_table(rows, args["out"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Compact binary traces of what happened during a run.
+
+Every spawn, stop, start, turn and exit of a car and every light phase
+change is one event. Each field of TRACE_COLUMNS has its own preallocated
+buffer, appended to its own file in the trace directory each time the
+buffers fill, so memory stays bounded however long the run:
+
+    sim.trace = TraceRecorder("run.trace")
+    sim.run(24 * 60 * 60)
+    sim.trace.close()
+
+    trace = load_trace("run.trace")
+    exits = trace["car"][trace["code"] == TraceRecorder.EXIT]
+
+A TrajectoryRecorder samples the car positions and lights the window shows
+instead, so that a run can be watched again later (main.py --replay)
+without simulating it.
+"""
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .snapshot import Snapshot
+
+if TYPE_CHECKING:
+    from .classes import Car, Simulator, TrafficLight
+
+TRACE_COLUMNS: dict[str, np.dtype] = {
+    "time": np.dtype(np.float64),  # Simulation seconds
+    "car": np.dtype(np.int64),  # Car serial, -1 for light events
+    "view": np.dtype(np.int8),
+    "road": np.dtype(np.int8),
+    "lane": np.dtype(np.int8),  # -1 for light events
+    "code": np.dtype(np.uint8),
+}
+
+# One row per car per trajectory frame
+TRAJECTORY_DTYPE = np.dtype([
+    ("serial", np.int64),
+    ("view", np.int8),
+    ("color", np.int8),
+    ("x", np.float32),
+    ("y", np.float32),
+    ("orientation", np.float32),
+])
+
+# One row per trajectory frame, in the index file next to the rows
+FRAME_DTYPE = np.dtype([
+    ("time", np.float64),
+    ("start", np.int64),  # First row of the frame
+    ("count", np.int32),
+    ("lights", np.int8, (2, 4)),  # Light states of the two drawn views
+])
+
+
+class TraceRecorder:
+
+    SPAWN = 0
+    STOP = 1  # Started braking
+    START = 2  # Started accelerating again
+    TURN = 3
+    EXIT = 4
+    LIGHT = 5  # LIGHT + State.Light of the phase the road's light entered
+
+    NAMES = ("spawn", "stop", "start", "turn", "exit",
+             "light_red", "light_yellow", "light_green", "light_pre_green")
+
+    def __init__(self, path: str, capacity: int = 65536, append: bool = False) -> None:
+        self.path = path  # A directory with one file per column
+        os.makedirs(path, exist_ok=True)
+        self.capacity = capacity
+        self.columns = {name: np.empty(capacity, dtype=dtype)
+                        for name, dtype in TRACE_COLUMNS.items()}
+        self.time, self.cars, self.views, self.roads, self.lanes, self.codes = \
+            self.columns.values()
+        self.size = 0
+        self.written = 0  # Events already in the files
+        self.files = {name: open(os.path.join(path, f"{name}.bin"), "ab" if append else "wb")
+                      for name in TRACE_COLUMNS}
+
+    def __len__(self) -> int:
+        return self.written + self.size
+
+    def __enter__(self) -> TraceRecorder:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def record(self, time: float, car: int, view: int, road: int, lane: int, code: int) -> None:
+        i = self.size
+        self.time[i] = time
+        self.cars[i] = car
+        self.views[i] = view
+        self.roads[i] = road
+        self.lanes[i] = lane
+        self.codes[i] = code
+        self.size = i + 1
+        if self.size == self.capacity:
+            self.flush()
+
+    def car(self, car: Car, code: int) -> None:
+        store, index = car.store, car.index
+        self.record(car.simulator.now, store.serial[index], store.view[index],
+                    store.road[index], store.lane[index], code)
+
+    def light(self, light: TrafficLight) -> None:
+        road = light.road
+        self.record(road.view.sim.now, -1, road.view.index, road.direction, -1,
+                    TraceRecorder.LIGHT + light.state)
+
+    def flush(self) -> None:
+        for name, column in self.columns.items():
+            file = self.files[name]
+            if self.size:
+                column[:self.size].tofile(file)
+            file.flush()
+        self.written += self.size
+        self.size = 0
+
+    def close(self) -> None:
+        if not self.files["time"].closed:
+            self.flush()
+            for file in self.files.values():
+                file.close()
+
+
+def load_trace(path: str) -> dict[str, np.ndarray]:
+    """Memory-map each column of a trace directory as a read-only array."""
+    columns = {name: _memmap(os.path.join(path, f"{name}.bin"), dtype)
+               for name, dtype in TRACE_COLUMNS.items()}
+    # A run killed mid-flush may have written some columns further than others
+    count = min(len(column) for column in columns.values())
+    return {name: column[:count] for name, column in columns.items()}
+
+
+def _memmap(path: str, dtype: np.dtype) -> np.ndarray:
+    # A run killed mid-flush may leave a partial record at the end
+    count = os.path.getsize(path) // dtype.itemsize
+    if not count:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class TrajectoryRecorder:
+    """
+    Samples the cars and lights of the two drawn views every interval
+    simulated seconds.
+
+    Rows go to path and one frame per sample to path + ".index", both
+    buffered and appended like TraceRecorder. Set as sim.trajectory.
+    """
+
+    def __init__(self, path: str, interval: float = 0.1, capacity: int = 65536) -> None:
+        self.path = path
+        self.interval = interval
+        self.next_time = -np.inf
+        self.rows = np.empty(capacity, dtype=TRAJECTORY_DTYPE)
+        self.frames = np.empty(max(1, capacity // 16), dtype=FRAME_DTYPE)
+        self.size = 0  # Buffered rows
+        self.frame_count = 0  # Buffered frames
+        self.written = 0  # Rows already in the file
+        self.file = open(path, "wb")
+        self.index = open(path + ".index", "wb")
+
+    def __enter__(self) -> TrajectoryRecorder:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def capture(self, sim: Simulator) -> None:
+        if sim.now < self.next_time:
+            return
+        self.next_time = sim.now + self.interval
+
+        snapshot = Snapshot.capture(sim, 0.0)
+        drawn = np.flatnonzero(snapshot.view < 2)
+        n = len(drawn)
+        if self.size + n > len(self.rows):
+            self.flush()
+            if n > len(self.rows):
+                self.rows = np.empty(n, dtype=TRAJECTORY_DTYPE)
+        rows = self.rows[self.size:self.size + n]
+        rows["serial"] = snapshot.serial[drawn]
+        rows["view"] = snapshot.view[drawn]
+        rows["color"] = snapshot.color[drawn]
+        rows["x"] = snapshot.position[drawn, 0]
+        rows["y"] = snapshot.position[drawn, 1]
+        rows["orientation"] = snapshot.orientation[drawn]
+
+        self.frames[self.frame_count] = (sim.now, self.written + self.size, n,
+                                         snapshot.lights[:2])
+        self.size += n
+        self.frame_count += 1
+        if self.frame_count == len(self.frames):
+            self.flush()
+
+    def flush(self) -> None:
+        # Rows first, so every frame in the index points at rows on disk
+        if self.size:
+            self.rows[:self.size].tofile(self.file)
+            self.written += self.size
+            self.size = 0
+        self.file.flush()
+        if self.frame_count:
+            self.frames[:self.frame_count].tofile(self.index)
+            self.frame_count = 0
+        self.index.flush()
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+            self.index.close()
+
+
+class Trajectory:
+    """
+    A recorded trajectory, memory-mapped. Seeking to any time is a binary
+    search of the frame index, however long the run.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.rows = _memmap(path, TRAJECTORY_DTYPE)
+        frames = _memmap(path + ".index", FRAME_DTYPE)
+        # Frames of a run that stopped before its rows were written
+        complete = np.searchsorted(frames["start"] + frames["count"], len(self.rows),
+                                   side="right")
+        self.frames = frames[:complete]
+        if not len(self.frames):
+            raise ValueError(f"No frames recorded in {path}")
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    @property
+    def start(self) -> float:
+        return float(self.frames["time"][0])
+
+    @property
+    def end(self) -> float:
+        return float(self.frames["time"][-1])
+
+    def seek(self, time: float) -> int:
+        """Index of the last frame at or before time."""
+        index = int(np.searchsorted(self.frames["time"], time, side="right")) - 1
+        return min(max(index, 0), len(self.frames) - 1)
+
+    def snapshot(self, index: int) -> Snapshot:
+        frame = self.frames[index]
+        start = int(frame["start"])
+        rows = self.rows[start:start + int(frame["count"])]
+        return Snapshot(
+            now=float(frame["time"]),
+            stamp=0.0,
+            serial=np.array(rows["serial"]),
+            view=np.array(rows["view"]),
+            color=np.array(rows["color"]),
+            position=np.stack((rows["x"], rows["y"]), axis=1).astype(np.float64),
+            orientation=rows["orientation"].astype(np.float64),
+            lights=tuple(map(tuple, frame["lights"].tolist())),
+        )
+
+    def at(self, time: float) -> Snapshot:
+        """The recorded state at time, interpolated between frames."""
+        index = self.seek(time)
+        current = self.snapshot(index)
+        if index + 1 == len(self.frames) or time <= current.now:
+            return current
+        following = self.snapshot(index + 1)
+        alpha = (time - current.now) / (following.now - current.now)
+        moved = following.interpolate(current, alpha)
+        # Lights switch at the frame they were recorded in
+        return Snapshot(time, moved.stamp, moved.serial, moved.view, moved.color,
+                        moved.position, moved.orientation, current.lights)
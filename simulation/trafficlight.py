@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import math
+
 
 class Smart:
 
@@ -12,9 +14,11 @@ class Smart:
                  base_offset: int = BASE_OFFSET,
                  increment_value: float = 1.0,
                  no_traffic_multiplier: float = 5.0,
-                 value_per_car: float = 1.0
+                 value_per_car: float = 1.0,
+                 view=None,
                  ) -> None:
         self.sim = sim
+        self.view = view or sim.view_1
         self.max_value = max_value
         self.base_offset = base_offset
         self.passive_increment = increment_value
@@ -28,12 +32,11 @@ class Smart:
     def update(self):
         if self.sim.paused:
             return
-        dt = self.sim.dt
-        game_speed = self.sim.speed
+        time_step = self.sim.time_step
         self.inactive_value = 0
 
-        active_cars: int = self.sim.get_active_road_cars(1)
-        inactive_cars: int = self.sim.get_inactive_road_cars(1)
+        active_cars: int = self.view.get_all_active_road_cars()
+        inactive_cars: int = self.view.get_all_inactive_road_cars()
 
         if active_cars == 0:
             inactive_boost = self.no_traffic_multiplier
@@ -53,7 +56,7 @@ class Smart:
 
         self.active_value = active_value
 
-        self.passive_increase += self.passive_increment * inactive_boost * dt * game_speed
+        self.passive_increase += self.passive_increment * inactive_boost * time_step
 
         self.inactive_value = inactive_cars * self.value_per_car + self.passive_increase
 
@@ -62,11 +65,23 @@ class Smart:
         if self.inactive_value > active_value:
             self.toggle_light()
 
+    def next_change(self) -> float:
+        """
+        When the lights would switch if no cars arrived: the passive
+        increase catches up with the active value at its no-traffic rate.
+        """
+        active_value = min(self.active_cars * self.value_per_car + self.base_offset,
+                           self.max_value)
+        rate = self.passive_increment * self.no_traffic_multiplier
+        if rate <= 0:
+            return math.inf
+        return self.sim.now + max(0.0, active_value - self.passive_increase) / rate
+
     def get_current_value(self) -> str:
         return f"{int(self.inactive_value)}:{int(self.active_value)}"
 
     def toggle_light(self):
-        self.sim.toggle_lights(0)
+        self.view.toggle_lights()
         self.active_cars = 0
         self.active_value = 0
         self.inactive_value = 0
@@ -78,23 +93,30 @@ class Basic:
     def __init__(self,
                  sim,
                  value: float = 120.0,
+                 view=None,
                  ) -> None:
+        if value <= 0:
+            raise ValueError(f"Basic light interval must be positive, got {value}")
         self.sim = sim
+        self.view = view or sim.view_2
         self.value = value
-        self.current = self.value
+        self.event = sim.events.schedule(sim.now + self.value, self.toggle_light)
+
+    @property
+    def current(self) -> float:
+        """Seconds left until the scheduled switch."""
+        return self.event.time - self.sim.now
 
     def update(self) -> None:
-        if self.sim.paused:
-            return
-        dt = self.sim.dt
-        game_speed = self.sim.speed
-        self.current -= 1.0 * dt * game_speed
-        if self.current < 0.0:
-            self.toggle_light()
+        pass
+
+    def next_change(self) -> float:
+        return self.event.time
 
     def get_current_value(self) -> str:
         return str(int(self.current))
 
     def toggle_light(self):
-        self.sim.toggle_lights(1)
-        self.current = self.value
+        self.view.toggle_lights()
+        self.event.cancel()
+        self.event = self.sim.events.schedule(self.sim.now + self.value, self.toggle_light)
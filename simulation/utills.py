@@ -1,3 +1,5 @@
+import functools
+
 import numpy as np
 
 
@@ -45,3 +47,22 @@ def ease_in_out_cubic(t: float) -> float:
 
 def ease(t: float) -> float:
     return ease_in_out_sine(t)
+
+
+def cached_geometry(method):
+    """
+    Cache a zero-argument Road or Lane geometry method.
+
+    Geometry is in fixed world units, so the value is built once and kept
+    until the owner clears its `_geometry_cache`.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self):
+        cache = self._geometry_cache
+        if name not in cache:
+            cache[name] = method(self)
+        return cache[name]
+
+    return wrapper
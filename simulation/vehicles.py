@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .classes import Car
+
+
+class VehicleStore:
+    """
+    Struct-of-arrays storage for every car in a Simulator.
+
+    Each car owns one row. The physics step runs over whole arrays, while
+    `Car` keeps the per-car decision logic and reads its row through
+    properties.
+    """
+
+    ACCELERATING = 1
+    DECELERATING = 2
+
+    def __init__(self, capacity: int = 256) -> None:
+        self.capacity = 0
+        self.size = 0  # High-water mark of used rows
+        self.serials = 0  # Cars ever added, so rows reused by new cars can be told apart
+        self.cars: list[Optional[Car]] = []
+        self.free: list[int] = []
+
+        self.position = np.zeros((0, 2))
+        self.velocity = np.zeros((0, 2))
+        self.offset = np.zeros((0, 2), dtype=np.int64)
+        self.speed = np.zeros(0)
+        self.orientation = np.zeros(0)
+        self.state = np.zeros(0, dtype=np.int8)
+        self.turning = np.zeros(0, dtype=bool)
+        self.active = np.zeros(0, dtype=bool)
+        self.view = np.zeros(0, dtype=np.int8)
+        self.road = np.zeros(0, dtype=np.int8)
+        self.lane = np.zeros(0, dtype=np.int8)
+        self.color = np.zeros(0, dtype=np.int8)
+        self.serial = np.zeros(0, dtype=np.int64)
+
+        self.grow(capacity)
+
+    def __len__(self) -> int:
+        return self.size - len(self.free)
+
+    def grow(self, capacity: int) -> None:
+        extra = capacity - self.capacity
+        if extra <= 0:
+            return
+
+        def extend(array: np.ndarray) -> np.ndarray:
+            padding = np.zeros((extra,) + array.shape[1:], dtype=array.dtype)
+            return np.concatenate((array, padding))
+
+        self.position = extend(self.position)
+        self.velocity = extend(self.velocity)
+        self.offset = extend(self.offset)
+        self.speed = extend(self.speed)
+        self.orientation = extend(self.orientation)
+        self.state = extend(self.state)
+        self.turning = extend(self.turning)
+        self.active = extend(self.active)
+        self.view = extend(self.view)
+        self.road = extend(self.road)
+        self.lane = extend(self.lane)
+        self.color = extend(self.color)
+        self.serial = extend(self.serial)
+        self.cars.extend([None] * extra)
+        self.capacity = capacity
+
+    def add(self, car: Car) -> int:
+        if self.free:
+            index = self.free.pop()
+        else:
+            if self.size == self.capacity:
+                self.grow(self.capacity * 2)
+            index = self.size
+            self.size += 1
+
+        self.cars[index] = car
+        self.position[index] = 0.0
+        self.velocity[index] = 0.0
+        self.offset[index] = 0
+        self.speed[index] = 0.0
+        self.orientation[index] = 0.0
+        self.state[index] = VehicleStore.ACCELERATING
+        self.turning[index] = False
+        self.active[index] = True
+        self.serial[index] = self.serials
+        self.serials += 1
+        return index
+
+    def remove(self, index: int) -> None:
+        if not self.active[index]:
+            return
+        self.active[index] = False
+        self.turning[index] = False
+        self.cars[index] = None
+        self.free.append(index)
+
+    def clear(self) -> None:
+        self.active[:] = False
+        self.turning[:] = False
+        self.cars = [None] * self.capacity
+        self.free = []
+        self.size = 0
+
+    def move(self, dt: float) -> None:
+        """Integrate every active car by dt simulated seconds."""
+        n = self.size
+        if n == len(self.free):
+            return
+
+        for index in np.flatnonzero(self.turning[:n] & self.active[:n]):
+            self.cars[index].update_turn()
+
+        position = self.position[:n]
+        velocity = self.velocity[:n]
+        state = self.state[:n]
+        speed = self.speed[:n]
+
+        # Snap headings to the nearest multiple of 90 degrees
+        radians = np.radians(np.rint(self.orientation[:n] / 90.0) * 90.0)
+        target_x = speed * np.cos(radians)
+        target_y = speed * np.sin(radians)
+
+        accelerating = state == VehicleStore.ACCELERATING
+        velocity[accelerating, 0] += (target_x[accelerating] - velocity[accelerating, 0]) * dt
+        velocity[accelerating, 1] += (target_y[accelerating] - velocity[accelerating, 1]) * dt
+
+        decelerating = state == VehicleStore.DECELERATING
+        velocity[decelerating] *= max(0.0, 1 - 5 * dt)
+
+        # Enforce speed limit
+        magnitude = np.hypot(velocity[:, 0], velocity[:, 1])
+        over = magnitude > speed
+        velocity[over] *= (speed[over] / magnitude[over])[:, None]
+
+        position += velocity * dt
+
+        self.sync_rects()
+
+    def sync_rects(self) -> None:
+        """Copy the integer positions back into each car's pygame Rects."""
+        n = self.size
+        indexes = np.flatnonzero(self.active[:n])
+        corners = self.position[indexes].astype(np.int64)
+        lookahead = corners + self.offset[indexes]
+        cars = self.cars
+        for index, (x, y), (lx, ly) in zip(indexes.tolist(),
+                                           corners.tolist(),
+                                           lookahead.tolist()):
+            car = cars[index]
+            car.rect.x = x
+            car.rect.y = y
+            car.lookahead.x = lx
+            car.lookahead.y = ly
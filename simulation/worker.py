@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from .snapshot import Snapshot
+
+if TYPE_CHECKING:
+    from .classes import Simulator
+
+
+class SimulationThread(threading.Thread):
+    """
+    Steps a Simulator on its own thread, independent of the frame rate.
+
+    After every batch of steps a Snapshot is published; the render loop
+    draws between the last two with interpolated(). Anything else touching
+    the simulation from another thread (events, buttons, resizes) must
+    hold lock. Layout stays with the render thread: steps never call
+    update_layout.
+    """
+
+    STEPS_PER_LOCK = 4  # Physics steps per hold of lock
+
+    def __init__(self, sim: Simulator, rate: float = 120.0) -> None:
+        super().__init__(name="simulation", daemon=True)
+        self.sim = sim
+        self.period = 1 / rate  # Real seconds between batches of steps
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        now = time.perf_counter()
+        snapshot = Snapshot.capture(sim, now)
+        # Replaced as a pair so readers never see a mismatched one
+        self.snapshots: tuple[Optional[Snapshot], Snapshot] = (None, snapshot)
+
+    def run(self) -> None:
+        sim = self.sim
+        last = time.perf_counter()
+        while sim.running and not self.stopped.is_set():
+            now = time.perf_counter()
+            with self.lock:
+                steps = sim.steps_due(now - last)
+            last = now
+            # The lock is let go between chunks so a frame waits on at most
+            # STEPS_PER_LOCK steps, not the whole batch
+            for start in range(0, steps, self.STEPS_PER_LOCK):
+                with self.lock:
+                    for _ in range(min(self.STEPS_PER_LOCK, steps - start)):
+                        sim.substep(sim.FIXED_STEP)
+                time.sleep(0)  # Let a waiting render thread take the lock
+                if self.stopped.is_set():
+                    return
+            if steps:
+                with self.lock:
+                    snapshot = Snapshot.capture(sim, now)
+                self.snapshots = (self.snapshots[1], snapshot)
+            self.stopped.wait(max(0.0, self.period - (time.perf_counter() - now)))
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+
+    def refresh(self) -> None:
+        """Publish the current state now, e.g. while paused; hold lock."""
+        self.snapshots = (None, Snapshot.capture(self.sim, time.perf_counter()))
+
+    def interpolated(self) -> Snapshot:
+        """
+        The state one batch behind real time, blended between the last two
+        snapshots so cars move smoothly whatever the two rates are.
+        """
+        previous, latest = self.snapshots
+        if previous is None:
+            return latest
+        interval = latest.stamp - previous.stamp
+        alpha = (time.perf_counter() - latest.stamp) / interval if interval > 0 else 1.0
+        return latest.interpolate(previous, min(1.0, alpha))